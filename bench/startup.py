@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Benchmark startup time of the papertape package and tapeutil.py.
+
+Each case is run in a fresh interpreter, and its median time less that
+of an interpreter doing nothing is compared with its budget. Modules
+which are only needed for rendering or TTY conversion are also checked
+not to be imported by import papertape. Exits with status 1 if any case
+is over budget, so that it may be used to catch startup regressions.'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Root of the source tree, whose papertape package is benchmarked
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup time budgets in milliseconds, over that of a bare interpreter
+BUDGETS = [
+    ('import papertape',            ['-c', 'import papertape'],                 20),
+    ('tapeutil.py',                 [os.path.join(ROOT, 'tapeutil.py')],        40),
+    ('tapeutil.py --load --save',   [os.path.join(ROOT, 'tapeutil.py'),
+                                     '--load', '{input}', '--save', '{output}'], 40),
+]
+
+# Modules which import papertape must leave to be imported on first use
+LAZY_MODULES = ['papertape.font5x7', 'papertape.tty', 'papertape.pbmtape',
+                'papertape.pngtape', 'papertape.pgmtape', 'papertape.svgtape',
+                'papertape.progress', 'papertape.serialio', 'zlib', 'math']
+
+
+def run_time(args, repeat):
+    '''Return median wall clock time in milliseconds of repeat runs of
+    the interpreter with arguments args.'''
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    times = []
+    for n in range(repeat):
+        start = time.time()
+        subprocess.check_call([sys.executable] + args, env=env)
+        times.append((time.time() - start) * 1000.0)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def eager_modules():
+    '''Return list of LAZY_MODULES imported by import papertape.'''
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    out = subprocess.check_output([sys.executable, '-c',
+                                   'import sys, papertape; print " ".join(sys.modules)'],
+                                  env=env)
+    loaded = out.split()
+    return [m for m in LAZY_MODULES if m in loaded]
+
+
+# Main entry point when called as an executable script.
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark startup time of papertape and tapeutil.py.')
+    parser.add_argument('--repeat', action='store', type=int, default=20,
+                        help='Number of runs of each case. Defaults to 20.')
+    parser.add_argument('--scale', action='store', type=float, default=1.0,
+                        help='''Multiply budgets by SCALE, e.g. for slow machines.
+                        Defaults to 1.0.''')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    fields = {'input':  os.path.join(tmpdir, 'in.tap'),
+              'output': os.path.join(tmpdir, 'out.tap')}
+    with open(fields['input'], 'wb') as f:
+        f.write('HELLO WORLD\r\n' * 100)
+
+    over = 0
+    try:
+        base = run_time(['-c', 'pass'], args.repeat)
+        print '{:30s} {:8.1f} ms'.format('python -c pass', base)
+        for name, case, budget in BUDGETS:
+            elapsed = run_time([arg.format(**fields) for arg in case], args.repeat) - base
+            budget  = budget * args.scale
+            status  = 'ok'
+            if elapsed > budget:
+                status = 'OVER BUDGET'
+                over   = over + 1
+            print '{:30s} {:+8.1f} ms  (budget {:.1f} ms)  {:s}'.format(name, elapsed, budget, status)
+
+        eager = eager_modules()
+        if eager:
+            print 'import papertape imports {:s}, which should be imported on first use.'.format(', '.join(eager))
+            over = over + 1
+    finally:
+        for name in fields.values():
+            if os.path.exists(name):
+                os.remove(name)
+        os.rmdir(tmpdir)
+
+    if over:
+        exit(1)
@@ -21,7 +21,10 @@
 
 """This package provides support for manipulating images of punched paper tapes."""
 
-__all__       = ['tape', 'font5x7', 'pbmtape', 'tty']
+__all__       = ['tape', 'maptape', 'segtape', 'stream', 'font5x7', 'pbmtape', 'pngtape', 'pgmtape', 'svgtape',
+                 'progress', 'serialio',
+                 'tty',
+                 'ttycodec']
 __version__   = '2.0.0-PRE-RELEASE'
 __copyright__ = 'Copyright (C) 2014 Mark J. Blair, released under GPLv3'
 __pkg_url__   = 'http://www.nf6x.net/tags/papertape/'
@@ -29,3 +32,7 @@ __dl_url__    = 'https://github.com/NF6X/papertape'
 
 
 from tape import *
+from maptape import *
+from segtape import *
+from stream import *
+import ttycodec
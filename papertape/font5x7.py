@@ -22,6 +22,10 @@
 '''5x7 font data'''
 
 
+# Cache of glyph atlases, keyed by (rotate, invert)
+_atlases = {}
+
+
 font5x7 = [
     [0x00, 0x00, 0x00, 0x00, 0x00], # 00 NUL
     [0x00, 0x00, 0x00, 0x00, 0x00], # 01
@@ -192,3 +196,26 @@ def invert_char(letter, height):
         inv_letter[n] = sum(1<<((height-1)-i) for i in range((height)) if letter[n]>>i&1)
 
     return inv_letter
+
+
+def glyph_atlas(rotate=False, invert=False):
+    '''Return list of the punched hole patterns of the 128 glyphs as
+    strings, each followed by a blank column, in the orientation used
+    by tape.add_title(). Built on first use for each orientation.'''
+
+    key = (rotate, invert)
+    if key in _atlases:
+        return _atlases[key]
+
+    atlas = []
+    for letter in font5x7:
+        if rotate:
+            letter = rotate_char(letter)
+            if invert:
+                letter = invert_char(letter, 5)
+        else:
+            if invert:
+                letter = invert_char(letter, 7)
+        atlas.append(str(bytearray(letter)) + '\x00')
+    _atlases[key] = atlas
+    return atlas
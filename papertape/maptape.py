@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Memory-mapped, read-only punched paper tape images.
+
+A maptape exposes a tape image file through mmap without reading it
+into memory. It cannot be modified in place; call its tape() method to
+obtain a private, modifiable copy when the first modification is needed.
+It may be rendered as an image directly, reading only the frames being
+rendered at any time.'''
+
+__all__ = ['maptape']
+
+import os
+import mmap
+
+from tape import tape
+
+# Largest block written at once when saving
+SAVE_BLOCK = 1048576
+
+
+class maptape(object):
+    '''Class representing a read-only punched paper tape image mapped
+    from a disk file.'''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file     = open(filename, 'rb')
+        size          = os.fstat(self.file.fileno()).st_size
+        if size > 0:
+            self.map  = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # Empty files cannot be mapped
+            self.map  = ''
+
+
+    def __len__(self):
+        return len(self.map)
+
+
+    def __getitem__(self, index):
+        return self.map[index]
+
+
+    def close(self):
+        '''Unmap the file.'''
+
+        if self.map:
+            self.map.close()
+        self.file.close()
+
+
+    def tape(self):
+        '''Return a private, modifiable copy of the tape image.'''
+
+        return tape(self.map)
+
+
+    def window(self, offset=0, length=None):
+        '''Return new tape holding length frames of the image starting at
+        frame offset, or through the end of the image if length is None.
+        Only those frames are read.'''
+
+        offset = min(offset, len(self))
+        if length is None:
+            length = len(self) - offset
+        return tape(buffer(self.map, offset, length))
+
+
+    def _render(self, renderer, filename, offset=0, length=None, **kwargs):
+        # Renderers only slice the image a block of frames at a time, so
+        # the whole image is rendered from the map without copying it.
+        buf = self
+        if offset or length is not None:
+            buf = self.window(offset, length)
+        renderer(tape=buf, filename=filename, **kwargs)
+
+
+    def render_pbm(self, filename, width=8, invert=False, backend=None, jobs=1,
+                   dpi=None, offset=0, length=None):
+        '''Generate PBM image of punched paper tape, as tape.render_pbm().'''
+
+        import pbmtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        self._render(pbmtape.pbmtape, filename, offset, length, width=width,
+                    invert=invert, backend=backend, jobs=jobs, dpi=dpi)
+
+
+    def render_png(self, filename, width=8, invert=False, dpi=None,
+                   offset=0, length=None):
+        '''Generate PNG image of punched paper tape, as tape.render_png().'''
+
+        import pbmtape
+        import pngtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        self._render(pngtape.pngtape, filename, offset, length, width=width,
+                    invert=invert, dpi=dpi)
+
+
+    def render_pgm(self, filename, width=8, invert=False, dpi=None,
+                   offset=0, length=None):
+        '''Generate PGM image of punched paper tape, as tape.render_pgm().'''
+
+        import pbmtape
+        import pgmtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        self._render(pgmtape.pgmtape, filename, offset, length, width=width,
+                    invert=invert, dpi=dpi)
+
+
+    def render_svg(self, filename, width=8, invert=False, offset=0, length=None):
+        '''Generate SVG image of punched paper tape, as tape.render_svg().'''
+
+        import svgtape
+        self._render(svgtape.svgtape, filename, offset, length, width=width,
+                    invert=invert)
+
+
+    def save(self, filename):
+        '''Save tape image to a disk file, writing it from the map a
+        block at a time. Will overwrite existing file with same name.'''
+
+        if os.path.exists(filename) and os.path.samefile(filename, self.filename):
+            # Already saved; truncating the mapped file would destroy it
+            return
+
+        f = open(filename, 'wb')
+        for offset in range(0, len(self), SAVE_BLOCK):
+            f.write(buffer(self.map, offset, SAVE_BLOCK))
+        f.close()
@@ -19,11 +19,18 @@
 #  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
 ##########################################################################
 
-'''Generate PBM image of punched paper tape conforming to ECMA-10 specification.'''
+'''Generate PBM image of punched paper tape conforming to ECMA-10 specification.
 
-import math
+Every frame of the tape is BIT_WIDTH rows of pixels high, and its
+pixels depend only upon the value of the frame. The packed scanlines of
+each possible frame are computed once per tape width and orientation
+from precomputed hole stencils, and the image is assembled by looking
+up each frame of the tape.'''
 
-# Each pixel = 0.01"
+import sys
+import binascii
+
+# Each pixel = 0.001"
 BIT_WIDTH  = 100
 BIT_DIAM   = 72
 FEED_DIAM  = 46
@@ -31,80 +38,253 @@ LEFTEDGE   = 42
 RIGHTEDGE5 = 45
 RIGHTEDGE7 = 58
 
-def pbmtape(tape, filename, width=8, invert=False):
-    '''Generate PBM image of punched paper tape conforming to ECMA-10 specification.'''
+# Resolution of the dimensions above, in pixels per inch
+DPI = 1000
 
-    assert(width in [5,8])
-    outfile = open(filename, 'wb')
+# Number of frames assembled and written at once
+BLOCK_FRAMES = 64
+
+# Tapes at least this long are rendered with NumPy, if it is available
+NUMPY_FRAMES = 65536
+
+# Cache of frame tables, keyed by (width, invert, dpi)
+_frames = {}
+
+
+def scale(length, dpi=DPI):
+    '''Return length in pixels at DPI scaled to dpi pixels per inch.'''
+
+    return max(1, int(round(length * float(dpi) / DPI)))
+
+
+def image_width(width=8, dpi=DPI):
+    '''Return width in pixels of image of tape width bits wide.'''
 
-    # Compute image size in pixels
-    imglength = len(tape) * BIT_WIDTH
+    assert(width in [5,8])
     if width == 5:
-        imgwidth = LEFTEDGE + (BIT_WIDTH * 6) + RIGHTEDGE5
+        return scale(LEFTEDGE, dpi) + (scale(BIT_WIDTH, dpi) * 6) + scale(RIGHTEDGE5, dpi)
     else:
-        imgwidth = LEFTEDGE + (BIT_WIDTH * 9) + RIGHTEDGE7
+        return scale(LEFTEDGE, dpi) + (scale(BIT_WIDTH, dpi) * 9) + scale(RIGHTEDGE7, dpi)
+
+
+def row_bytes(width=8, dpi=DPI):
+    '''Return length in bytes of each packed row of pixels.'''
+
+    return (image_width(width, dpi) + 7) // 8
+
+
+def frame_bytes(width=8, dpi=DPI):
+    '''Return length in bytes of the packed pixels of each frame.'''
+
+    return row_bytes(width, dpi) * scale(BIT_WIDTH, dpi)
+
+
+def header(tapelen, width=8, dpi=DPI):
+    '''Return PBM header for image of tape with tapelen frames.'''
+
+    return 'P4\n{:d} {:d}\n'.format(image_width(width, dpi), tapelen * scale(BIT_WIDTH, dpi))
+
+
+def hole_offsets(width=8, dpi=DPI):
+    '''Return (data, feed), where data lists the horizontal pixel offset
+    of each data bit's hole from LSB to MSB, and feed is the offset of
+    the feed hole.'''
+
+    bit_width = scale(BIT_WIDTH, dpi)
+    leftedge  = scale(LEFTEDGE, dpi)
+    data = [(b * bit_width) + leftedge for b in range(3)]
+    data = data + [((b+1) * bit_width) + leftedge for b in range(3, width)]
+    return (data, (3 * bit_width) + leftedge)
+
+
+def hole_span(y, diam, dpi=DPI):
+    '''Return (x0, x1), the first and last pixels of row y within a
+    hole of diameter diam centered in a BIT_WIDTH square, or None.
+
+    diam is given in pixels at DPI, and the result in pixels at dpi.'''
+
+    bit_width = scale(BIT_WIDTH, dpi)
+    diam      = scale(diam, dpi)
+    y1 = y - (bit_width/2)
+    r2 = (diam/2) * (diam/2)
+    xs = [x for x in range(bit_width) if ((x - (bit_width/2))**2) + (y1*y1) <= r2]
+    if not xs:
+        return None
+    return (xs[0], xs[-1])
+
+
+def stencil(y, diam, offset, width=8, invert=False, dpi=DPI):
+    '''Return integer bit mask of the pixels in row y of a hole of
+    diameter diam at horizontal pixel offset, packed with the leftmost
+    pixel of the row in the most significant bit.'''
+
+    span = hole_span(y, diam, dpi)
+    if span is None:
+        return 0
+    imgwidth = image_width(width, dpi)
+    padwidth = row_bytes(width, dpi) * 8
+    x0 = span[0] + offset
+    x1 = span[1] + offset
+    if invert:
+        # Inverted images are mirrored left to right
+        x0, x1 = (imgwidth - 1 - x1), (imgwidth - 1 - x0)
+    return ((1 << (x1 - x0 + 1)) - 1) << (padwidth - 1 - x1)
+
+
+def frame_table(width=8, invert=False, dpi=DPI):
+    '''Return list of packed pixels for each of the 256 possible frames.
+
+    Frames differing only in bits beyond the tape width share entries.'''
+
+    key = (width, invert, dpi)
+    if key in _frames:
+        return _frames[key]
+
+    data, feed = hole_offsets(width, dpi)
+    hexlen     = row_bytes(width, dpi) * 2
+    rows       = range(scale(BIT_WIDTH, dpi))
+
+    # Stencils for the data holes and feed hole of each row
+    data_stencils = [[stencil(y, BIT_DIAM, offset, width, invert, dpi) for offset in data]
+                     for y in rows]
+    feed_stencils = [stencil(y, FEED_DIAM, feed, width, invert, dpi) for y in rows]
+
+    frames = []
+    for char in range(1 << width):
+        frame = []
+        for y in rows:
+            mask = feed_stencils[y]
+            for b in range(width):
+                if char & (0x01 << b):
+                    mask = mask | data_stencils[y][b]
+            frame.append('{:0{:d}x}'.format(mask, hexlen))
+        frames.append(binascii.unhexlify(''.join(frame)))
+
+    table = [frames[char & ((1 << width) - 1)] for char in range(256)]
+    _frames[key] = table
+    return table
+
+
+def numpy_frame_table(width=8, invert=False, dpi=DPI):
+    '''Return NumPy array of packed pixels for each of the 256 possible
+    frames, indexed by frame value.'''
+
+    import numpy
+
+    table = frame_table(width, invert, dpi)
+    return numpy.frombuffer(''.join(table), dtype=numpy.uint8).reshape(256, frame_bytes(width, dpi))
+
+
+def have_numpy():
+    '''Return True if the NumPy backend is available.'''
+
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
+
+
+def render_frames(tape, width=8, invert=False, backend=None, dpi=DPI):
+    '''Yield packed pixels of successive blocks of frames of tape.
+
+    backend may be 'python' or 'numpy'. By default, NumPy is used for
+    tapes of at least NUMPY_FRAMES frames if it is available.'''
+
+    if backend is None:
+        if len(tape) >= NUMPY_FRAMES and have_numpy():
+            backend = 'numpy'
+        else:
+            backend = 'python'
+
+    if backend == 'numpy':
+        import numpy
+        table = numpy_frame_table(width, invert, dpi)
+        for start in range(0, len(tape), BLOCK_FRAMES * 16):
+            chars = numpy.frombuffer(bytes(tape[start:start + (BLOCK_FRAMES * 16)]),
+                                     dtype=numpy.uint8)
+            yield table[chars].tobytes()
+    else:
+        table = frame_table(width, invert, dpi)
+        for start in range(0, len(tape), BLOCK_FRAMES):
+            yield ''.join([table[char] for char in bytearray(tape[start:start + BLOCK_FRAMES])])
+
+
+def open_output(filename):
+    '''Return file object to which an image named filename is written.
+    The filename '-' selects standard output, so that images may be
+    piped into other programs.'''
+
+    if filename == '-':
+        return sys.stdout
+    return open(filename, 'wb')
+
+
+def close_output(outfile):
+    '''Close file object returned by open_output().'''
+
+    if outfile is sys.stdout:
+        outfile.flush()
+    else:
+        outfile.close()
+
+
+def render_range(filename, pos, chars, width=8, invert=False, dpi=DPI):
+    '''Render chars, a range of frames of a tape, into an existing,
+    preallocated image file starting at byte offset pos.'''
+
+    import mmap
+
+    f   = open(filename, 'r+b')
+    img = mmap.mmap(f.fileno(), 0)
+    for block in render_frames(chars, width, invert, 'python', dpi):
+        img[pos:pos + len(block)] = block
+        pos = pos + len(block)
+    img.close()
+    f.close()
+
+
+def _render_range(args):
+    # Process pool entry point
+    render_range(*args)
+
+
+def pbmtape(tape, filename, width=8, invert=False, backend=None, jobs=1, dpi=DPI):
+    '''Generate PBM image of punched paper tape conforming to ECMA-10 specification.
+
+    Dimensions are scaled to dpi pixels per inch. Low resolutions are
+    better served by the anti-aliased rendering of pgmtape.
+
+    If jobs is greater than 1, the file is preallocated and ranges of
+    frames are rendered directly into it by a pool of jobs processes.
+    Images written to standard output are always rendered serially.'''
+
+    assert(width in [5,8])
+    outfile = open_output(filename)
 
     # Image header
-    outfile.write('P4\n')
-    outfile.write('{:d} {:d}\n'.format(imgwidth, imglength))
+    outfile.write(header(len(tape), width, dpi))
+
+    if jobs > 1 and len(tape) > BLOCK_FRAMES and outfile is not sys.stdout:
+        # Preallocate the image, then render ranges of frames in parallel
+        import multiprocessing
+        base = len(header(len(tape), width, dpi))
+        outfile.truncate(base + (len(tape) * frame_bytes(width, dpi)))
+        outfile.close()
+        step  = max(BLOCK_FRAMES, (len(tape) + (jobs * 4) - 1) // (jobs * 4))
+        tasks = [(filename, base + (start * frame_bytes(width, dpi)),
+                  str(tape[start:start + step]), width, invert, dpi)
+                 for start in range(0, len(tape), step)]
+        pool  = multiprocessing.Pool(jobs)
+        try:
+            pool.map(_render_range, tasks)
+        finally:
+            pool.close()
+            pool.join()
+        return
 
     # Render image
-    for char in tape:
-
-        # Render each row of pixels for this bit
-        for y in range(BIT_WIDTH):
-            row = [0]*imgwidth
-            c = char
-
-            # Render first three bits
-            for b in range(3):
-                if c & 0x01:
-                    offset = (b * BIT_WIDTH) + LEFTEDGE
-                    for x in range(BIT_WIDTH):
-                        x1 = x - (BIT_WIDTH/2)
-                        y1 = y - (BIT_WIDTH/2)
-                        r = math.sqrt((x1*x1) + (y1*y1))
-                        if r <= (BIT_DIAM/2):
-                            row[x+offset] = 1
-                c = c >> 1
-
-            # Render feed hole
-            offset = (3 * BIT_WIDTH) + LEFTEDGE;
-            for x in range(BIT_WIDTH):
-                x1 = x - (BIT_WIDTH/2)
-                y1 = y - (BIT_WIDTH/2)
-                r = math.sqrt((x1*x1) + (y1*y1))
-                if r <= (FEED_DIAM/2):
-                    row[x+offset] = 1
-
-            # Render remaining bits
-            for b in range(3,width):
-                if c & 0x01:
-                    offset = ((b+1) * BIT_WIDTH) + LEFTEDGE
-                    for x in range(BIT_WIDTH):
-                        x1 = x - (BIT_WIDTH/2)
-                        y1 = y - (BIT_WIDTH/2)
-                        r = math.sqrt((x1*x1) + (y1*y1))
-                        if r <= (BIT_DIAM/2):
-                            row[x+offset] = 1
-                c = c >> 1
-
-            # Output the data for this row of pixels
-            if invert:
-                for x in range(imgwidth-1, 0, -8):
-                    c = 0
-                    for b in range(8):
-                        c = c << 1
-                        if ((x-b) >= 0) and row[x-b]:
-                            c = c | 0x01
-                    outfile.write(chr(c))
-            else:
-                for x in range(0, imgwidth, 8):
-                    c = 0
-                    for b in range(8):
-                        c = c << 1
-                        if ((x+b) < imgwidth) and row[x+b]:
-                            c = c | 0x01
-                    outfile.write(chr(c))
-
-    outfile.close()    
+    for block in render_frames(tape, width, invert, backend, dpi):
+        outfile.write(block)
+
+    close_output(outfile)
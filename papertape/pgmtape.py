@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Generate anti-aliased PGM image of punched paper tape conforming to
+ECMA-10 specification.
+
+Holes are rasterized by area coverage at any resolution, with the exact
+horizontal extent of each hole and OVERSAMPLE vertical samples per row
+of pixels. This suits thumbnails at resolutions too low for the binary
+rendering of pbmtape, which is limited to whole pixels.'''
+
+import math
+
+import pbmtape
+
+# Vertical samples per row of pixels
+OVERSAMPLE = 4
+
+# Number of rows of pixels written at once
+BLOCK_ROWS = 256
+
+# Maximum number of distinct rendered rows cached
+ROW_CACHE = 4096
+
+
+def header(tapelen, width=8, dpi=pbmtape.DPI):
+    '''Return PGM header for image of tape with tapelen frames.'''
+
+    return 'P5\n{:d} {:d}\n255\n'.format(image_width(width, dpi),
+                                          image_length(tapelen, dpi))
+
+
+def image_width(width=8, dpi=pbmtape.DPI):
+    '''Return width in pixels of image of tape width bits wide.'''
+
+    return max(1, int(round(pbmtape.image_width(width) * float(dpi) / pbmtape.DPI)))
+
+
+def image_length(tapelen, dpi=pbmtape.DPI):
+    '''Return length in pixels of image of tape with tapelen frames.'''
+
+    return int(round(tapelen * pbmtape.BIT_WIDTH * float(dpi) / pbmtape.DPI))
+
+
+def hole_table(width=8):
+    '''Return list of the holes punched for each of the 256 possible
+    frames, as (center, radius) tuples in pixels at pbmtape.DPI.'''
+
+    data, feed = pbmtape.hole_offsets(width)
+    center = pbmtape.BIT_WIDTH / 2.0
+    table  = []
+    for char in range(256):
+        holes = [(feed + center, pbmtape.FEED_DIAM / 2.0)]
+        for b in range(width):
+            if char & (0x01 << b):
+                holes.append((data[b] + center, pbmtape.BIT_DIAM / 2.0))
+        table.append(holes)
+    return table
+
+
+def cover(row, x0, x1, weight):
+    '''Add weight times the fraction of each pixel of row covered by
+    the interval from x0 to x1.'''
+
+    for x in range(max(0, int(x0)), min(len(row), int(math.ceil(x1)))):
+        row[x] = row[x] + (weight * (min(x1, x + 1) - max(x0, x)))
+
+
+def row_samples(tape, y, dpi):
+    '''Return tuple of (frame value, vertical offset from frame center)
+    for each vertical sample of row y, or None for samples beyond the
+    end of the tape. Rows with equal samples have equal pixels.'''
+
+    scale   = float(dpi) / pbmtape.DPI
+    samples = []
+    for n in range(OVERSAMPLE):
+        # Sample position in pixels at pbmtape.DPI
+        ys    = (y + ((n + 0.5) / OVERSAMPLE)) / scale
+        frame = int(ys // pbmtape.BIT_WIDTH)
+        if frame >= len(tape):
+            samples.append(None)
+        else:
+            dy = ys - ((frame * pbmtape.BIT_WIDTH) + (pbmtape.BIT_WIDTH / 2.0))
+            # Slicing gives the same frame value for tapes and maptapes
+            samples.append((bytearray(tape[frame:frame + 1])[0], round(dy, 6)))
+    return tuple(samples)
+
+
+def render_row(samples, holes, imgwidth, dpi):
+    '''Return list of hole coverage of each pixel of a row with the
+    given vertical samples.'''
+
+    scale  = float(dpi) / pbmtape.DPI
+    row    = [0.0] * imgwidth
+    weight = 1.0 / OVERSAMPLE
+    for sample in samples:
+        if sample is None:
+            continue
+        char, dy = sample
+        for center, radius in holes[char]:
+            if abs(dy) < radius:
+                chord = math.sqrt((radius * radius) - (dy * dy))
+                cover(row, (center - chord) * scale, (center + chord) * scale, weight)
+    return row
+
+
+def pgmtape(tape, filename, width=8, invert=False, dpi=pbmtape.DPI):
+    '''Generate anti-aliased PGM image of punched paper tape conforming
+    to ECMA-10 specification, at dpi pixels per inch.'''
+
+    assert(width in [5,8])
+    outfile = pbmtape.open_output(filename)
+
+    # Image header
+    outfile.write(header(len(tape), width, dpi))
+
+    # Holes are black and tape is white, as in pbmtape. Since tapes
+    # repeat a small set of frames, rendered rows are cached.
+    shades = str(bytearray(255 - n for n in range(256)))
+    holes  = hole_table(width)
+    width  = image_width(width, dpi)
+    cache  = {}
+    rows   = []
+    for y in range(image_length(len(tape), dpi)):
+        samples = row_samples(tape, y, dpi)
+        row     = cache.get(samples)
+        if row is None:
+            row = bytearray(int(round(min(1.0, c) * 255))
+                            for c in render_row(samples, holes, width, dpi))
+            if invert:
+                # Inverted images are mirrored left to right
+                row.reverse()
+            row = str(row.translate(shades))
+            if len(cache) >= ROW_CACHE:
+                cache.clear()
+            cache[samples] = row
+        rows.append(row)
+        if len(rows) >= BLOCK_ROWS:
+            outfile.write(''.join(rows))
+            rows = []
+    outfile.write(''.join(rows))
+
+    pbmtape.close_output(outfile)
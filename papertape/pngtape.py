@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Generate PNG image of punched paper tape conforming to ECMA-10 specification.
+
+The image has the same geometry as the PBM image generated by pbmtape,
+encoded as a 1-bit grayscale PNG. Scanlines are compressed into the
+image data a block of frames at a time as they are produced, so memory
+use is independent of the length of the tape.'''
+
+import zlib
+import struct
+
+import pbmtape
+
+# PNG file signature
+SIGNATURE = '\x89PNG\r\n\x1a\n'
+
+# Compressed image data is written in chunks of at least this size
+IDAT_SIZE = 65536
+
+# Number of frames compressed at once
+BLOCK_FRAMES = 256
+
+# Default zlib compression level. Higher levels make images little
+# smaller, but are many times slower to write.
+LEVEL = 3
+
+# Cache of PNG frame tables, keyed by (width, invert, dpi)
+_frames = {}
+
+
+def chunk(kind, data):
+    '''Return PNG chunk of the given kind containing data.'''
+
+    crc = zlib.crc32(kind + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+
+def frame_table(width=8, invert=False, dpi=pbmtape.DPI):
+    '''Return list of PNG scanlines, each preceded by its filter type
+    byte, for each of the 256 possible frames.'''
+
+    key = (width, invert, dpi)
+    if key in _frames:
+        return _frames[key]
+
+    # PBM uses 1 for black, while PNG grayscale uses 0 for black
+    rowlen = pbmtape.row_bytes(width, dpi)
+    black  = str(bytearray((~n) & 0xFF for n in range(256)))
+
+    table  = []
+    frames = {}
+    for frame in pbmtape.frame_table(width, invert, dpi):
+        if frame not in frames:
+            rows = [frame[n:n + rowlen].translate(black)
+                    for n in range(0, len(frame), rowlen)]
+            frames[frame] = '\x00' + '\x00'.join(rows)
+        table.append(frames[frame])
+    _frames[key] = table
+    return table
+
+
+def pngtape(tape, filename, width=8, invert=False, dpi=pbmtape.DPI, level=LEVEL):
+    '''Generate PNG image of punched paper tape conforming to ECMA-10 specification.
+
+    Dimensions are scaled to dpi pixels per inch, and image data is
+    compressed at zlib compression level level.'''
+
+    assert(width in [5,8])
+    outfile = pbmtape.open_output(filename)
+
+    # Image header: 1-bit grayscale, no interlacing
+    outfile.write(SIGNATURE)
+    outfile.write(chunk('IHDR', struct.pack('>IIBBBBB', pbmtape.image_width(width, dpi),
+                                            len(tape) * pbmtape.scale(pbmtape.BIT_WIDTH, dpi),
+                                            1, 0, 0, 0, 0)))
+
+    # Compress scanlines a block of frames at a time as they are produced
+    table  = frame_table(width, invert, dpi)
+    stream = zlib.compressobj(level)
+    data   = []
+    size   = 0
+    for start in range(0, len(tape), BLOCK_FRAMES):
+        frames = bytearray(tape[start:start + BLOCK_FRAMES])
+        block  = stream.compress(''.join([table[char] for char in frames]))
+        if block:
+            data.append(block)
+            size = size + len(block)
+            if size >= IDAT_SIZE:
+                outfile.write(chunk('IDAT', ''.join(data)))
+                data = []
+                size = 0
+    data.append(stream.flush())
+    outfile.write(chunk('IDAT', ''.join(data)))
+
+    outfile.write(chunk('IEND', ''))
+    pbmtape.close_output(outfile)
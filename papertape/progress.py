@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Rate-limited progress display for tape transfers over serial ports.
+
+The transfer loop hands each block of data to progress.update(), which
+only queues it. A separate thread shows the queued data as a hex dump,
+or a status line with the count, rate and, if the total length of the
+transfer is known, the percentage done and estimated time remaining.
+The display is updated at most once per interval, so that a slow
+terminal never holds up the serial port.
+
+This module is not imported by import papertape.'''
+
+__all__ = ['progress']
+
+import sys
+import time
+import threading
+import collections
+
+# Default time in seconds between display updates
+INTERVAL = 0.1
+
+# Hex dump of each char, as shown by tapein.py and tapeout.py
+_hex = ['{:02X} '.format(n) for n in range(256)]
+
+
+class progress(object):
+    '''Progress display for a tape transfer, updated by its own thread.'''
+
+    def __init__(self, out=sys.stdout, hexdump=True, interval=INTERVAL,
+                 total=None, initial=0):
+        '''total is the length of the whole transfer, if known, of which
+        initial chars were transferred before this display started.'''
+
+        self.out      = out
+        self.hexdump  = hexdump
+        self.interval = interval
+        self.total    = total
+        self.initial  = initial
+        self.pending  = collections.deque()
+        self.count    = 0
+        self.shown    = 0
+        self.started  = time.time()
+        self.first    = None
+        self.leader   = 0
+        self.last     = None
+        self.done     = threading.Event()
+        self.thread   = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+
+    def start(self):
+        '''Start the display thread and the transfer clock.'''
+
+        self.started = time.time()
+        self.thread.start()
+
+
+    def update(self, data):
+        '''Record that the chars of data have been transferred. Never
+        blocks on the display.'''
+
+        if not data:
+            return
+        now = time.time()
+        if self.first is None:
+            self.first  = now
+            self.leader = len(data)
+        self.last  = now
+        self.count = self.count + len(data)
+        if self.hexdump:
+            self.pending.append(data)
+
+
+    def discard(self, count):
+        '''Record that count of the chars recorded as transferred were
+        not transferred after all, e.g. having been discarded from an
+        output queue.'''
+
+        self.count  = max(0, self.count - count)
+        self.leader = min(self.leader, self.count)
+
+
+    def rate(self):
+        '''Return average chars per second from the first block
+        transferred to the last, or 0 if not known until a second
+        block has been transferred.'''
+
+        if self.first is None or self.last <= self.first:
+            return 0.0
+        # The first block was transferred before it was recorded
+        return (self.count - self.leader) / (self.last - self.first)
+
+
+    def status(self):
+        '''Return status line describing the transfer so far.'''
+
+        rate = self.rate()
+        if self.total is None:
+            line = '{:d} chars'.format(self.count)
+        else:
+            done = self.initial + self.count
+            line = '{:d}/{:d} chars  {:5.1f}%'.format(
+                done, self.total, (100.0 * done) / max(1, self.total))
+        if rate > 0:
+            line = line + '  {:.0f} chars/sec'.format(rate)
+            if self.total is not None:
+                eta  = int((self.total - done) / rate)
+                line = line + '  ETA {:d}:{:02d}:{:02d}'.format(eta // 3600, (eta // 60) % 60, eta % 60)
+        return line
+
+
+    def _show(self):
+        # Called only by the display thread, and by finish() after it ends
+        if self.hexdump:
+            buf = []
+            while self.pending:
+                for c in bytearray(self.pending.popleft()):
+                    buf.append(_hex[c])
+                    self.shown = self.shown + 1
+                    if (self.shown % 16) == 0:
+                        buf.append('\n')
+            if buf:
+                self.out.write(''.join(buf))
+                self.out.flush()
+        elif self.count != self.shown:
+            self.shown = self.count
+            self.out.write('\r' + self.status() + '   ')
+            self.out.flush()
+
+
+    def _run(self):
+        while not self.done.wait(self.interval):
+            self._show()
+
+
+    def finish(self):
+        '''Stop the display thread, and show any remaining data.'''
+
+        self.done.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self._show()
+        if (self.hexdump and (self.shown % 16) != 0) or (not self.hexdump and self.shown):
+            self.out.write('\n')
+            self.out.flush()
+
+
+    def summary(self):
+        '''Return string summarizing the transfer.'''
+
+        elapsed = time.time() - self.started
+        rate    = self.rate()
+        if rate == 0 and self.count:
+            # A single block; its rate is only known over the whole transfer
+            rate = self.count / max(elapsed, 1e-6)
+        return '{:d} chars in {:.1f} seconds, {:.0f} chars/sec.'.format(
+            self.count, elapsed, rate)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Segmented representation of punched paper tapes.
+
+A segtape is built by linking segments together rather than copying
+them, so that leaders, trailers, titles and other tapes may be added to
+either end of a large tape in constant time. Leader and trailer fill is
+held as run-length segments, which occupy no memory per frame. A
+segtape may be saved, sliced and hex dumped segment by segment.
+
+Any other tape method, such as a translation or a rendering, flattens
+the segments into a single contiguous tape on demand and is performed
+upon it, so that a segtape may be used wherever a tape is.'''
+
+__all__ = ['segtape']
+
+import collections
+
+from tape import tape, title_pattern
+from maptape import maptape
+
+# Largest block yielded at once when saving a run or mapped segment
+SEGMENT_BLOCK = 1048576
+
+
+class run(object):
+    '''Segment consisting of a single char repeated count times,
+    occupying constant memory regardless of its length.'''
+
+    def __init__(self, char, count):
+        self.char  = chr(char & 0xFF)
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        # Only slices are taken of segments
+        return self.char * len(xrange(*index.indices(self.count)))
+
+    def blocks(self):
+        '''Yield contents of segment as strings of up to SEGMENT_BLOCK chars.'''
+
+        remaining = self.count
+        block     = self.char * min(remaining, SEGMENT_BLOCK)
+        while remaining > 0:
+            if remaining < len(block):
+                block = block[:remaining]
+            yield block
+            remaining = remaining - len(block)
+
+
+class segtape(object):
+    '''Class representing the contents of a punched paper tape as a
+    sequence of linked segments.
+
+    Tapes, bytearrays and maptapes are linked rather than copied, so
+    should not be modified after being linked into a segtape. The tape
+    flattened from the segments is modified in place by later tape
+    methods, until it is linked into another segtape.'''
+
+    def __init__(self, data=None):
+        self.segments = collections.deque()
+        self.length   = 0
+        self.flat     = None
+        if data is not None:
+            self.append(data)
+
+
+    def __len__(self):
+        if self.length is None:
+            # A flattened tape may have been modified since
+            self.length = sum(len(seg) for seg in self.segments)
+        return self.length
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self._slice(start, stop)
+        elif -len(self) <= index < len(self):
+            index = index % len(self)
+            return self._slice(index, index + 1)[0]
+        return self._flatten()[index]
+
+
+    def __getattr__(self, name):
+        # Called only for attributes not found otherwise, i.e. the tape
+        # methods not performed upon the segments themselves.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._flatten(), name)
+
+
+    def __add__(self, other):
+        result = segtape(self)
+        result.append(other)
+        return result
+
+
+    def __iadd__(self, other):
+        self.append(other)
+        return self
+
+
+    def _segments_of(self, data):
+        # Return list of segments to be linked for data
+        if isinstance(data, segtape):
+            # Its flattened tape is now shared, so must be copied
+            # before it is next modified.
+            data.flat = None
+            return list(data.segments)
+        elif isinstance(data, (run, bytearray, maptape)):
+            return [data]
+        else:
+            return [str(data)]
+
+
+    def _slice(self, start, stop):
+        # Return bytearray of frames start through stop - 1, taken from
+        # only the segments holding them
+        buf  = bytearray()
+        base = 0
+        for seg in self.segments:
+            if base >= stop:
+                break
+            size = len(seg)
+            if base + size > start:
+                buf.extend(seg[max(0, start - base):min(size, stop - base)])
+            base = base + size
+        return buf
+
+
+    def _flatten(self):
+        # Return the segments as a single private tape, which replaces them
+        if len(self.segments) != 1 or self.segments[0] is not self.flat:
+            self.flat = self.tape()
+            self.segments.clear()
+            self.segments.append(self.flat)
+        self.length = None
+        return self.flat
+
+
+    def append(self, data):
+        '''Link data to the end of the tape.
+
+        data may be a tape, bytearray, string, maptape or another segtape.'''
+
+        length = len(self)
+        for seg in self._segments_of(data):
+            if len(seg) > 0:
+                self.segments.append(seg)
+                length = length + len(seg)
+        self.length = length
+
+
+    def prepend(self, data):
+        '''Link data to the beginning of the tape.
+
+        data may be a tape, bytearray, string, maptape or another segtape.'''
+
+        length = len(self)
+        for seg in reversed(self._segments_of(data)):
+            if len(seg) > 0:
+                self.segments.appendleft(seg)
+                length = length + len(seg)
+        self.length = length
+
+
+    def clear(self):
+        '''Discard tape contents.'''
+
+        self.segments.clear()
+        self.length = 0
+
+
+    def close(self):
+        '''Discard tape contents, unmapping any mapped files linked.'''
+
+        for seg in self.segments:
+            if isinstance(seg, maptape):
+                seg.close()
+        self.clear()
+
+
+    def load(self, filename, append=False):
+        '''Load tape from a disk file.
+
+        Previous contents will be discarded unless append is True, in
+        which case the file is linked to the end of the tape.'''
+
+        buf = tape()
+        buf.load(filename)
+        if not append:
+            self.clear()
+        self.append(buf)
+
+
+    def save(self, filename):
+        '''Save tape to a disk file, a segment at a time.
+
+        Will overwrite existing file with same name.'''
+
+        f = open(filename, 'wb')
+        for block in self.blocks():
+            f.write(block)
+        f.close()
+
+
+    def blocks(self):
+        '''Yield contents of tape as a sequence of strings or buffers.'''
+
+        for seg in self.segments:
+            if isinstance(seg, run):
+                for block in seg.blocks():
+                    yield block
+            elif isinstance(seg, maptape):
+                for offset in xrange(0, len(seg), SEGMENT_BLOCK):
+                    yield buffer(seg.map, offset, SEGMENT_BLOCK)
+            else:
+                yield seg
+
+
+    def tape(self):
+        '''Return contents as a new contiguous tape.'''
+
+        buf = tape()
+        for block in self.blocks():
+            buf.extend(block)
+        return buf
+
+
+    def window(self, offset=0, length=None):
+        '''Return new tape holding length frames of the tape starting at
+        frame offset, or through the end of the tape if length is None.
+        Only those frames are copied.'''
+
+        if length is None:
+            return tape(self[offset:])
+        return tape(self[offset:offset + length])
+
+
+    def add_leader(self, length=10, char=0x00):
+        '''Add a leader to the beginning of the tape.
+
+        By default, length is 10 characters (typically one inch).
+        By default, leader consists of NUL bytes.
+        Set char to ASCII value to be added otherwise.'''
+
+        self.prepend(run(char, length))
+
+
+    def add_trailer(self, length=10, char=0x00):
+        '''Add a trailer to the end of the tape.
+
+        By default, length is 10 characters (typically one inch).
+        By default, trailer consists of NUL bytes.
+        Set char to ASCII value to be added otherwise.'''
+
+        self.append(run(char, length))
+
+
+    def add_title(self, title, rotate=False, invert=False):
+        '''Add a human-readable title to the beginning of the tape.'''
+
+        self.prepend(title_pattern(title, rotate=rotate, invert=invert))
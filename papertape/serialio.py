@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Event-driven serial I/O for driving many tape readers and punches
+from one process.
+
+A multiplexer waits with select.poll() upon the file descriptors of any
+number of reader and punch endpoints, and moves data for whichever are
+ready, so that no port holds up another. Each endpoint keeps its own
+statistics in a papertape.progress display.
+
+Each reader writes its output file from its own thread, so that a slow
+disk never holds up the ports. Received data is held in memory until it
+is written. A reader whose held data exceeds HIGH_WATER is not read
+again until it falls below LOW_WATER, so that a slow output file backs
+up into the serial driver and, through hardware flow control, the
+reader itself, rather than into unbounded memory. Punches are written
+only as fast as their serial drivers accept data.
+
+Ports may be pyserial ports, which are non-blocking on POSIX systems,
+or any other objects with a fileno() method, such as pseudo-terminals.
+This module requires select.poll(), so is not available on Windows. It
+is not imported by import papertape.'''
+
+__all__ = ['endpoint', 'reader', 'punch', 'multiplexer', 'open_port']
+
+import os
+import time
+import errno
+import select
+import threading
+import collections
+
+from progress import progress
+
+# Largest block read from or written to a port at once
+IO_BLOCK = 4096
+
+# Largest block written to a reader's output file at once
+FILE_BLOCK = 65536
+
+# Held data at which a reader is paused, and at which it is resumed
+HIGH_WATER = 1048576
+LOW_WATER  = 262144
+
+# Time in seconds between flushes of reader output files to disk
+FLUSH_INTERVAL = 1.0
+
+
+def open_port(port, baudrate=4800, dsrdtr=False):
+    '''Open serial port for use with a multiplexer, with hardware flow
+    control and without blocking.'''
+
+    import serial
+    return serial.Serial(port=port, baudrate=baudrate,
+                         bytesize=serial.EIGHTBITS,
+                         parity=serial.PARITY_NONE, timeout=0, xonxoff=False,
+                         rtscts=True, dsrdtr=dsrdtr)
+
+
+class endpoint(object):
+    '''Tape reader or punch attached to a port, with statistics.'''
+
+    def __init__(self, port, name=None, total=None):
+        self.port  = port
+        self.fd    = port.fileno()
+        self.name  = name or getattr(port, 'port', None) or str(self.fd)
+        self.stats = progress(hexdump=False, total=total)
+        self.done  = False
+
+    def events(self):
+        '''Return poll events awaited, or 0 if none.'''
+
+        return 0
+
+    def ready(self, events):
+        '''Move data for the port, given the poll events which occurred.'''
+
+        pass
+
+    def close(self):
+        '''Finish with the port.'''
+
+        self.done = True
+        self.port.close()
+
+    def status(self):
+        '''Return status line for the endpoint.'''
+
+        return '{:s}: {:s}'.format(self.name, self.stats.status())
+
+
+class reader(endpoint):
+    '''Endpoint capturing data from a tape reader into a file.'''
+
+    def __init__(self, port, outfile, name=None):
+        endpoint.__init__(self, port, name)
+        self.outfile = outfile
+        self.held    = collections.deque()
+        self.heldlen = 0
+        self.paused  = False
+        self.closing = False
+        self.cond    = threading.Condition()
+        self.writer  = threading.Thread(target=self._write)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def events(self):
+        if self.done:
+            return 0
+        if self.paused:
+            if self.heldlen > LOW_WATER:
+                return 0
+            self.paused = False
+        return select.POLLIN | select.POLLPRI
+
+    def ready(self, events):
+        if events & (select.POLLIN | select.POLLPRI):
+            try:
+                data = os.read(self.fd, IO_BLOCK)
+            except OSError as e:
+                if e.errno in [errno.EAGAIN, errno.EINTR]:
+                    return
+                raise
+            if data:
+                with self.cond:
+                    self.held.append(data)
+                    self.heldlen = self.heldlen + len(data)
+                    self.cond.notify()
+                self.stats.update(data)
+                if self.heldlen >= HIGH_WATER:
+                    self.paused = True
+                return
+        if events & (select.POLLHUP | select.POLLERR | select.POLLNVAL):
+            # The port has gone away
+            self.close()
+
+    def _write(self):
+        # Called only by the writer thread
+        flushed = time.time()
+        while True:
+            data = []
+            size = 0
+            with self.cond:
+                while not self.held and not self.closing:
+                    self.cond.wait(FLUSH_INTERVAL)
+                    if time.time() - flushed >= FLUSH_INTERVAL:
+                        break
+                while self.held and size < FILE_BLOCK:
+                    block = self.held.popleft()
+                    data.append(block)
+                    size = size + len(block)
+                if not data and self.closing:
+                    return
+            if data:
+                self.outfile.write(''.join(data))
+                with self.cond:
+                    self.heldlen = self.heldlen - size
+            if time.time() - flushed >= FLUSH_INTERVAL:
+                self.outfile.flush()
+                os.fsync(self.outfile.fileno())
+                flushed = time.time()
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+        self.writer.join()
+        self.outfile.flush()
+        os.fsync(self.outfile.fileno())
+        endpoint.close(self)
+
+
+class punch(endpoint):
+    '''Endpoint sending data to a tape punch.'''
+
+    def __init__(self, port, data, name=None):
+        endpoint.__init__(self, port, name, total=len(data))
+        self.data = data
+        self.pos  = 0
+
+    def events(self):
+        if self.done:
+            return 0
+        return select.POLLOUT
+
+    def ready(self, events):
+        if events & select.POLLOUT:
+            try:
+                sent = os.write(self.fd, self.data[self.pos:self.pos + IO_BLOCK])
+            except OSError as e:
+                if e.errno in [errno.EAGAIN, errno.EINTR]:
+                    return
+                raise
+            self.stats.update(self.data[self.pos:self.pos + sent])
+            self.pos = self.pos + sent
+            if self.pos >= len(self.data):
+                self.close()
+        elif events & (select.POLLHUP | select.POLLERR | select.POLLNVAL):
+            self.close()
+
+
+class multiplexer(object):
+    '''Event loop moving data for any number of endpoints.'''
+
+    def __init__(self, endpoints=[]):
+        self.endpoints = list(endpoints)
+
+    def add(self, ep):
+        '''Add endpoint ep to the loop.'''
+
+        self.endpoints.append(ep)
+
+    def step(self, timeout=0.1):
+        '''Wait up to timeout seconds for any endpoint to become ready,
+        and move its data. Returns False once every endpoint is done.'''
+
+        poll  = select.poll()
+        fds   = {}
+        for ep in self.endpoints:
+            events = ep.events()
+            if events:
+                poll.register(ep.fd, events)
+                fds[ep.fd] = ep
+        try:
+            for fd, events in poll.poll(timeout * 1000):
+                fds[fd].ready(events)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+        return not all(ep.done for ep in self.endpoints)
+
+    def run(self, tick=None, interval=1.0):
+        '''Move data until every endpoint is done, or until interrupted
+        by ^C, calling tick() every interval seconds, e.g. to show
+        status. All endpoints are closed on return.'''
+
+        last = time.time()
+        try:
+            while self.step(min(interval, 0.1)):
+                if tick and time.time() - last >= interval:
+                    tick()
+                    last = time.time()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for ep in self.endpoints:
+                if not ep.done:
+                    ep.close()
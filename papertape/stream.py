@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Streaming processing of punched paper tape images in fixed-size chunks.
+
+Each stage of a pipeline accepts a tape chunk at a time through feed(),
+and returns the processed data which is ready for output. Stages which
+must see data beyond the end of a chunk, such as trailer detection,
+carry state from one chunk to the next and return any data they are
+still holding from finish() at the end of the stream.'''
+
+__all__ = ['stage', 'mapstage', 'prefixstage', 'suffixstage', 'trimstage',
+           'padstage', 'crlfstage', 'ascii2ttystage', 'tty2asciistage', 'pipeline', 'stream']
+
+import re
+
+from tape import tape, char_set, pad_matcher, CRLF_PAD
+
+# Default number of bytes read from the input at once
+CHUNK_SIZE = 65536
+
+
+class stage(object):
+    '''Pipeline stage which passes data through unchanged.'''
+
+    def feed(self, chunk):
+        '''Process a tape chunk, returning tape of data ready for output.'''
+
+        return chunk
+
+    def finish(self):
+        '''Return tape of any data held back at the end of the stream.'''
+
+        return tape()
+
+
+class mapstage(stage):
+    '''Pipeline stage applying a stateless in-place tape operation,
+    such as tape.transform, to each chunk.'''
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def feed(self, chunk):
+        self.func(chunk, *self.args)
+        return chunk
+
+
+class prefixstage(stage):
+    '''Pipeline stage emitting data ahead of the stream, such as a
+    leader or title.'''
+
+    def __init__(self, data):
+        self.data = data
+
+    def _take(self):
+        data, self.data = self.data, None
+        return data
+
+    def feed(self, chunk):
+        if self.data is not None:
+            chunk[0:0] = self._take()
+        return chunk
+
+    def finish(self):
+        if self.data is not None:
+            return tape(self._take())
+        return tape()
+
+
+class suffixstage(stage):
+    '''Pipeline stage emitting data at the end of the stream, such as
+    a trailer.'''
+
+    def __init__(self, data):
+        self.data = data
+
+    def finish(self):
+        return tape(self.data)
+
+
+class trimstage(stage):
+    '''Pipeline stage removing leader and trailer, as tape.trim().
+
+    Characters which might belong to the trailer are held back as
+    run lengths until a character which is not part of the trailer
+    arrives, and are discarded at the end of the stream.'''
+
+    def __init__(self, char=0x00):
+        self.chars   = char_set(char)
+        self.runs    = re.compile('([{:s}])\\1*'.format(re.escape(self.chars)))
+        self.started = False
+        self.held    = []
+
+    def _hold(self, data):
+        for m in self.runs.finditer(data):
+            char = m.group(1)
+            if self.held and self.held[-1][0] == char:
+                self.held[-1][1] = self.held[-1][1] + len(m.group(0))
+            else:
+                self.held.append([char, len(m.group(0))])
+
+    def feed(self, chunk):
+        if not self.started:
+            chunk = chunk.lstrip(self.chars)
+            if len(chunk) == 0:
+                return tape()
+            self.started = True
+        body = chunk.rstrip(self.chars)
+        if len(body) == 0:
+            self._hold(str(chunk))
+            return tape()
+        out = tape(''.join(char * count for char, count in self.held))
+        out.extend(body)
+        self.held = []
+        self._hold(str(chunk[len(body):]))
+        return out
+
+
+class padstage(stage):
+    '''Pipeline stage adding fill chars after each occurrence of a
+    pattern, as tape.pad(), including patterns split across chunks.
+
+    The last chars of each chunk which might begin a pattern completed
+    by the next chunk are held back until it arrives.'''
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.regex, self.fills, self.maxlen = pad_matcher(rules)
+        self.held  = ''
+
+    def feed(self, chunk):
+        data = self.held + str(chunk)
+        # Matches starting before safe lie entirely within data
+        safe = len(data) - (self.maxlen - 1)
+        out  = []
+        pos  = 0
+        for m in self.regex.finditer(data):
+            if m.start() >= safe:
+                break
+            out.append(data[pos:m.end()])
+            out.append(self.fills[m.group(0)])
+            pos = m.end()
+        cut = max(pos, safe)
+        out.append(data[pos:cut])
+        self.held = data[cut:]
+        return tape(''.join(out))
+
+    def finish(self):
+        data = tape(self.held)
+        self.held = ''
+        data.pad(self.rules)
+        return data
+
+
+class crlfstage(padstage):
+    '''Pipeline stage adding two DEL chars after each CR-LF, as
+    tape.pad_crlf(), including sequences split across chunks.'''
+
+    def __init__(self):
+        padstage.__init__(self, CRLF_PAD)
+
+
+class ascii2ttystage(stage):
+    '''Pipeline stage converting ASCII to 5-level TTY code, as
+    tape.ascii2tty(), carrying the shift state between chunks.'''
+
+    def __init__(self):
+        self.figs = None
+
+    def feed(self, chunk):
+        self.figs = chunk.ascii2tty(figs=self.figs)
+        return chunk
+
+
+class tty2asciistage(stage):
+    '''Pipeline stage converting 5-level TTY code to ASCII, as
+    tape.tty2ascii(), carrying the shift state between chunks.'''
+
+    def __init__(self):
+        self.figs = False
+
+    def feed(self, chunk):
+        self.figs = chunk.tty2ascii(figs=self.figs)
+        return chunk
+
+
+class pipeline(stage):
+    '''Sequence of pipeline stages, applied first to last.'''
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    def feed(self, chunk):
+        for s in self.stages:
+            chunk = s.feed(chunk)
+        return chunk
+
+    def finish(self):
+        data = tape()
+        for s in self.stages:
+            data = s.feed(data)
+            data.extend(s.finish())
+        return data
+
+
+def stream(infile, outfile, stages, chunk_size=CHUNK_SIZE):
+    '''Process infile through a list of pipeline stages in chunks of
+    chunk_size bytes, writing the results to outfile.
+
+    Memory use is independent of the length of the stream.'''
+
+    pipe = pipeline(stages)
+    while True:
+        block = infile.read(chunk_size)
+        if not block:
+            break
+        outfile.write(pipe.feed(tape(block)))
+    outfile.write(pipe.finish())
+    outfile.flush()
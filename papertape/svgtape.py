@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Generate SVG image of punched paper tape conforming to ECMA-10 specification.
+
+The image has the same geometry and orientation as the PBM image
+generated by pbmtape, with user units of pbmtape pixels. Data and feed
+holes are defined once as symbols and placed with <use> elements, so
+the size of the image depends upon the number of holes punched rather
+than upon its area. The image is written a block of frames at a time.'''
+
+import pbmtape
+
+# Number of frames written at once
+BLOCK_FRAMES = 256
+
+# Cache of per-frame hole placements, keyed by (width, invert)
+_frames = {}
+
+
+def header(tapelen, width=8):
+    '''Return SVG header, through the hole symbol definitions, for image
+    of tape with tapelen frames.'''
+
+    imgwidth  = pbmtape.image_width(width)
+    imglength = tapelen * pbmtape.BIT_WIDTH
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink" '
+            'width="{:g}in" height="{:g}in" viewBox="0 0 {:d} {:d}">\n'
+            '<defs>\n'
+            '<symbol id="d" overflow="visible"><circle r="{:g}" fill="black"/></symbol>\n'
+            '<symbol id="f" overflow="visible"><circle r="{:g}" fill="black"/></symbol>\n'
+            '</defs>\n'
+            '<rect width="{:d}" height="{:d}" fill="white"/>\n').format(
+                float(imgwidth) / pbmtape.DPI, float(imglength) / pbmtape.DPI,
+                imgwidth, imglength,
+                pbmtape.BIT_DIAM / 2.0, pbmtape.FEED_DIAM / 2.0,
+                imgwidth, imglength)
+
+
+def trailer():
+    '''Return end of SVG image.'''
+
+    return '</svg>\n'
+
+
+def frame_table(width=8, invert=False):
+    '''Return list of <use> elements placing the holes of each of the
+    256 possible frames, with {y} in place of the vertical position.'''
+
+    key = (width, invert)
+    if key in _frames:
+        return _frames[key]
+
+    imgwidth   = pbmtape.image_width(width)
+    data, feed = pbmtape.hole_offsets(width)
+    center     = pbmtape.BIT_WIDTH / 2
+
+    def place(symbol, offset):
+        x = offset + center
+        if invert:
+            # Inverted images are mirrored left to right
+            x = imgwidth - x
+        return '<use xlink:href="#{:s}" x="{:d}" y="{{y}}"/>'.format(symbol, x)
+
+    table = []
+    for char in range(256):
+        uses = [place('f', feed)]
+        for b in range(width):
+            if char & (0x01 << b):
+                uses.append(place('d', data[b]))
+        table.append(''.join(uses) + '\n')
+    _frames[key] = table
+    return table
+
+
+def svgtape(tape, filename, width=8, invert=False):
+    '''Generate SVG image of punched paper tape conforming to ECMA-10 specification.'''
+
+    assert(width in [5,8])
+    outfile = pbmtape.open_output(filename)
+
+    outfile.write(header(len(tape), width))
+
+    table  = frame_table(width, invert)
+    center = pbmtape.BIT_WIDTH / 2
+    for start in range(0, len(tape), BLOCK_FRAMES):
+        block = bytearray(tape[start:start + BLOCK_FRAMES])
+        outfile.write(''.join([table[char].format(y=((start + n) * pbmtape.BIT_WIDTH) + center)
+                               for n, char in enumerate(block)]))
+        outfile.flush()
+
+    outfile.write(trailer())
+    pbmtape.close_output(outfile)
@@ -21,12 +21,298 @@
 
 '''This class provides support for manipulating images of punched paper tapes.'''
 
+import re
 import string
+import binascii
 __printable__ = string.ascii_letters + string.digits + string.punctuation
 
-import font5x7
-import pbmtape
-import tty
+# The font, TTY code and rendering modules are imported where they are
+# first used, so that importing papertape stays cheap for programs
+# which only load, modify and save tapes.
+
+
+# Largest block read at once when loading
+LOAD_BLOCK = 1048576
+
+# Runs of tagged 5-level TTY codes requiring letters or figures shift,
+# each followed by any codes which are valid in either shift
+_shift_runs = re.compile(r'[\x00-\x1f][\x00-\x1f\x40-\x5f]*|[\x80-\x9f][\x80-\x9f\x40-\x5f]*')
+
+# 5-level TTY shift chars, LTRS and FIGS
+_shift_chars = re.compile(r'([\x1b\x1f])')
+
+# Cache of 256-entry byte translation tables, keyed by operation.
+_tables = {}
+
+# Cache of ASCII art rows for each frame value, keyed by (width, invert)
+_ascii_rows = {}
+
+# Number of frames rendered at once as ASCII art
+ASCII_BLOCK = 4096
+
+# Number of bytes formatted at once by hex_dump(), a multiple of 16
+HEXDUMP_BLOCK = 4096
+
+# Padding rule of tape.pad_crlf(): two DEL chars after each CR-LF
+CRLF_PAD = [('\r\n', '\x7f\x7f')]
+
+# Cache of padding matchers, keyed by rules
+_pad_matchers = {}
+
+# Hex field of a full line of hex_dump(), from 16 pairs of hex digits
+_hex_line = ' %s %s %s %s  %s %s %s %s  %s %s %s %s  %s %s %s %s '
+
+
+def byte_table(func):
+    '''Return a 256-entry translation table mapping each byte value n
+    to func(n), suitable for use with bytearray.translate().'''
+
+    return str(bytearray(func(n) & 0xFF for n in range(256)))
+
+
+def cached_table(key, func):
+    '''Return the translation table for func, building it on first use.
+
+    key identifies the operation, e.g. ('xor', 0xFF).'''
+
+    table = _tables.get(key)
+    if table is None:
+        table = byte_table(func)
+        _tables[key] = table
+    return table
+
+
+def identity_table():
+    '''Return the translation table which leaves every byte unchanged.'''
+
+    return cached_table(('identity',), lambda n: n)
+
+
+def xor_table(mask):
+    '''Return translation table for bitwise XOR with mask.'''
+
+    mask = mask & 0xFF
+    return cached_table(('xor', mask), lambda n: n ^ mask)
+
+
+def and_table(mask):
+    '''Return translation table for bitwise AND with mask.'''
+
+    mask = mask & 0xFF
+    return cached_table(('and', mask), lambda n: n & mask)
+
+
+def or_table(mask):
+    '''Return translation table for bitwise OR with mask.'''
+
+    mask = mask & 0xFF
+    return cached_table(('or', mask), lambda n: n | mask)
+
+
+def reverse_table(numbits=8):
+    '''Return translation table reversing the order of numbits least
+    significant bits of each byte, discarding more significant bits.'''
+
+    return cached_table(('reverse', numbits),
+                        lambda n: sum(1<<(numbits-1-i) for i in range(numbits) if n>>i&1))
+
+
+def compose_tables(*tables):
+    '''Return a single translation table equivalent to applying each of
+    the given tables in turn, first to last.'''
+
+    result = identity_table()
+    for table in tables:
+        result = result.translate(table)
+    return result
+
+
+def asc2tty_table():
+    '''Return translation table from ASCII to 5-level TTY codes tagged
+    with the FIGS_F and ETHR_F flags, ignoring MSBs.'''
+
+    import tty
+    return cached_table(('asc2tty',), lambda n: tty.asc2tty[n & tty.MSK7])
+
+
+def asc2tty_invalid():
+    '''Return string of chars which have no 5-level TTY equivalent.'''
+
+    chars = _tables.get(('asc2tty_invalid',))
+    if chars is None:
+        import tty
+        chars = ''.join(chr(n) for n in range(256)
+                        if tty.asc2tty[n & tty.MSK7] == tty.INVC)
+        _tables[('asc2tty_invalid',)] = chars
+    return chars
+
+
+def _tty_ord(char):
+    # 5-level TTY to ASCII tables hold strings, except at the shift codes
+    if isinstance(char, str):
+        return ord(char)
+    return char
+
+
+def tty_ltrs_table():
+    '''Return translation table from 5-level TTY code to ASCII in
+    letters shift, ignoring MSBs.'''
+
+    import tty
+    return cached_table(('ltrs2asc',), lambda n: _tty_ord(tty.tty_ltrs2asc[n & tty.MSK5]))
+
+
+def tty_figs_table():
+    '''Return translation table from 5-level TTY code to ASCII in
+    figures shift, ignoring MSBs.'''
+
+    import tty
+    return cached_table(('figs2asc',), lambda n: _tty_ord(tty.tty_figs2asc[n & tty.MSK5]))
+
+
+def char_set(chars):
+    '''Return string of the characters given by chars, which may be a
+    single ASCII value, an iterable of ASCII values, or a string.'''
+
+    if isinstance(chars, (int, long)):
+        return chr(chars & 0xFF)
+    elif isinstance(chars, (str, bytearray)):
+        return str(chars)
+    else:
+        return ''.join(chr(c & 0xFF) for c in chars)
+
+
+def title_pattern(title, rotate=False, invert=False):
+    '''Return bytearray containing the punched hole pattern of a
+    human-readable title, as added by tape.add_title().'''
+
+    import font5x7
+    atlas = font5x7.glyph_atlas(rotate=bool(rotate), invert=bool(invert))
+    return bytearray('\x00' + ''.join([atlas[ord(char) & 0x7F] for char in title]))
+
+
+def ascii_edge(width=8):
+    '''Return leading or trailing edge of ASCII art rendering of tape.'''
+
+    return '+' + ('-' * (width + 1)) + '+\n'
+
+
+def ascii_row(char, width=8, invert=False):
+    '''Return row of ASCII art rendering of frame char.'''
+
+    buf = '|'
+    if invert:
+        for n in reversed(range(width)):
+            if char & (0x01 << (width-1)):
+                buf = buf + 'o'
+            else:
+                buf = buf + ' '
+            if n == 3:
+                buf = buf + '.'
+            char = char << 1
+    else:
+        for n in range(width):
+            if char & 0x01:
+                buf = buf + 'o'
+            else:
+                buf = buf + ' '
+            if n == 2:
+                buf = buf + '.'
+            char = char >> 1
+    return buf + '|\n'
+
+
+def ascii_table(width=8, invert=False):
+    '''Return list of ASCII art rows for each of the 256 possible frames.'''
+
+    key   = (width, invert)
+    table = _ascii_rows.get(key)
+    if table is None:
+        table = [ascii_row(char, width, invert) for char in range(256)]
+        _ascii_rows[key] = table
+    return table
+
+
+def ascii_art(buf, width=8, invert=False, offset=0, length=None):
+    '''Yield successive blocks of ASCII art rendering of buf, in style
+    of bcd(1), from frame offset through length frames or the end of buf.
+
+    buf may be a tape or any other buffer of frames, such as a maptape.'''
+
+    table = ascii_table(width, invert)
+    end   = len(buf)
+    if length is not None:
+        end = min(end, offset + length)
+
+    yield ascii_edge(width)
+    for start in range(offset, end, ASCII_BLOCK):
+        block = bytearray(buf[start:min(start + ASCII_BLOCK, end)])
+        yield ''.join(map(table.__getitem__, block))
+    yield ascii_edge(width)
+
+
+def pad_matcher(rules):
+    '''Return (regex, fills, maxlen) for a list of (pattern, fill)
+    padding rules, as used by tape.pad(). regex matches any of the
+    patterns, preferring the longest, fills maps each pattern to its
+    fill, and maxlen is the length of the longest pattern.'''
+
+    rules = tuple((char_set(pattern), char_set(fill)) for pattern, fill in rules)
+    if rules in _pad_matchers:
+        return _pad_matchers[rules]
+    if not rules or not all(pattern for pattern, fill in rules):
+        raise ValueError('padding patterns must not be empty')
+
+    fills    = dict(rules)
+    patterns = sorted(fills.keys(), key=len, reverse=True)
+    regex    = re.compile('|'.join(re.escape(pattern) for pattern in patterns))
+    matcher  = (regex, fills, len(patterns[0]))
+    _pad_matchers[rules] = matcher
+    return matcher
+
+
+def hexdump_ascii_table():
+    '''Return the translation table mapping each byte to its character
+    in the ASCII column of a hex dump, ignoring the MSB.'''
+
+    def printable(n):
+        if chr(n & 0x7F) in __printable__:
+            return n & 0x7F
+        return ord(' ')
+    return cached_table(('hexdump_ascii',), printable)
+
+
+def hex_dump(buf, offset=0, length=None):
+    '''Yield successive blocks of lines of hex dump of buf, from byte
+    offset through length bytes or the end of buf.
+
+    buf may be a tape or any other buffer of bytes, such as a maptape.
+    The offset field is widened beyond 4 digits as needed to hold the
+    largest offset dumped. MSBs are ignored in the ASCII representation.'''
+
+    end = len(buf)
+    if length is not None:
+        end = min(end, offset + length)
+    digits = max(4, len('{:X}'.format(max(0, end - 1))))
+    table  = hexdump_ascii_table()
+
+    for start in range(offset, end, HEXDUMP_BLOCK):
+        block  = str(buf[start:min(start + HEXDUMP_BLOCK, end)])
+        hexblk = binascii.hexlify(block).upper()
+        ascblk = block.translate(table)
+        lines  = []
+        for n in range(0, len(block), 16):
+            h = hexblk[2*n:2*n + 32]
+            a = ascblk[n:n + 16]
+            if len(a) == 16:
+                hexfld = _hex_line % tuple(h[i:i + 2] for i in range(0, 32, 2))
+            else:
+                hexfld = ''.join(' ' + h[2*i:2*i + 2] + (' ' if (i % 4) == 3 else '')
+                                 for i in range(len(a)))
+            ascfld = ' '.join(a[i:i + 4] for i in range(0, 16, 4))
+            lines.append('{:{:d}s} {:52s} {:20s}\n'.format(
+                '{:0{:d}X}:'.format(start + n, digits), digits + 1, hexfld, ascfld))
+        yield ''.join(lines)
 
 
 class tape(bytearray):
@@ -41,12 +327,18 @@ class tape(bytearray):
     def load(self, filename, append=False):
         '''Load buffer from a disk file.
 
-        Previous buffer contents will be discarded unless append is True.'''
+        Previous buffer contents will be discarded unless append is True.
+        The file is read in blocks, so that its contents are not briefly
+        held in memory twice.'''
 
         if not append:
             self.clear()
         f = open(filename, 'rb')
-        self.extend(f.read())
+        while True:
+            block = f.read(LOAD_BLOCK)
+            if not block:
+                break
+            self.extend(block)
         f.close()
 
 
@@ -60,52 +352,41 @@ class tape(bytearray):
         f.close()
 
 
-    def hexdump(self):
-        '''Return string containing hex dump of buffer.
+    def hexdump(self, offset=0, length=None):
+        '''Return string containing hex dump of buffer, from byte offset
+        through length bytes or the end of the buffer.
 
         MSBs are ignored in the ASCII representation.'''
 
-        dump = ''
-        for n in range(len(self)):
-            if (n % 16) == 0:
-                offset = '{:04X}:'.format(n)
-                hexfld = ''
-                ascfld = ''
-            hexfld = hexfld + ' {:02X}'.format(self[n])
-            if (n % 4) == 3:
-                hexfld = hexfld + ' '
-            b = chr(self[n] & 0x7F)
-            if b in __printable__:
-                ascfld = ascfld + b
-            else:
-                ascfld = ascfld + ' '
-            if (n % 4) == 3:
-                ascfld = ascfld + ' '
-            if ((n % 16) == 15) or (n == len(self)-1):
-                dump = dump + '{:5s} {:52s} {:20s}\n'.format(offset,hexfld,ascfld)
-        return dump
+        return ''.join(hex_dump(self, offset, length))
+
+
+    def write_hexdump(self, f, offset=0, length=None):
+        '''Write hex dump of buffer, from byte offset through length
+        bytes or the end of the buffer, to file object f a block at a time.'''
+
+        for block in hex_dump(self, offset, length):
+            f.write(block)
+
 
-                
     def trim(self, char=0x00):
         '''Remove leader and trailer from beginning and end of buffer.
 
         By default, expect leader and trailer to consist of NUL bytes.
-        Set char to ASCII value to be removed otherwise.'''
+        Set char to ASCII value to be removed otherwise, or to a set of
+        ASCII values to remove any of them. A buffer consisting only of
+        leader is emptied.'''
 
-        while self[0] == char:
-            del self[0]
-        while self[-1] == char:
-            del self[-1]
+        self[:] = self.strip(char_set(char))
 
 
     def strip_char(self, char):
-        '''Remove each instance of the specified character from the buffer.'''
+        '''Remove each instance of the specified character from the buffer.
 
-        while True:
-            try:
-                self.remove(char)
-            except ValueError:
-                break
+        char may also be a set of ASCII values, all of which are removed
+        in a single pass.'''
+
+        self[:] = self.translate(None, char_set(char))
 
 
     def strip_nul(self):
@@ -120,11 +401,17 @@ class tape(bytearray):
         self.strip_char(0x7F)
                 
 
+    def transform(self, table):
+        '''Replace each byte of buffer with its entry in a 256-entry
+        translation table, such as one returned by byte_table().'''
+
+        self[:] = self.translate(table)
+
+
     def xor_buf(self, mask):
         '''Replace each byte of buffer with bitwise XOR of mask with previous value.'''
 
-        for n in range(len(self)):
-            self[n] = self[n] ^ (mask & 0xFF)
+        self.transform(xor_table(mask))
 
 
     def inv_buf(self):
@@ -136,15 +423,13 @@ class tape(bytearray):
     def and_buf(self, mask):
         '''Replace each byte of buffer with bitwise AND of mask with previous value.'''
 
-        for n in range(len(self)):
-            self[n] = self[n] & mask
+        self.transform(and_table(mask))
 
 
     def or_buf(self, mask):
         '''Replace each byte of buffer with bitwise OR of mask with previous value.'''
 
-        for n in range(len(self)):
-            self[n] = self[n] | (mask & 0xFF)
+        self.transform(or_table(mask))
 
 
     def set_msb(self):
@@ -166,8 +451,7 @@ class tape(bytearray):
         By default, leader consists of NUL bytes.
         Set char to ASCII value to be added otherwise.'''
 
-        for n in range(length):
-            self.insert(0, char)
+        self[0:0] = chr(char) * length
 
 
     def add_trailer(self, length=10, char=0x00):
@@ -180,180 +464,196 @@ class tape(bytearray):
         self.extend(chr(char)*length)
 
 
+    def pad(self, rules):
+        '''Add fill chars after each occurrence of a pattern in buffer.
+
+        rules is a list of (pattern, fill) tuples, each of which may be
+        a string, a bytearray, an ASCII value or an iterable of ASCII
+        values. All rules are applied in a single pass, so fill chars
+        are never themselves padded. Where patterns overlap, the
+        leftmost match wins, and the longest pattern at that position.'''
+
+        regex, fills, maxlen = pad_matcher(rules)
+        if len(fills) == 1:
+            pattern, fill = fills.items()[0]
+            self[:] = str(self).replace(pattern, pattern + fill)
+        else:
+            self[:] = regex.sub(lambda m: m.group(0) + fills[m.group(0)], str(self))
+
+
     def pad_crlf(self):
         '''Add two DEL chars after each CR-LF sequence.'''
 
-        if len(self) > 1:
-            buf = bytearray()
-            buf.append(self[0])
-            for n in range(1, len(self)):
-                buf.append(self[n])
-                if (self[n] == 0x0A) and (self[n-1] == 0x0D):
-                    buf.append(0x7F)
-                    buf.append(0x7F)
-            self.clear()
-            self.extend(buf)
+        self.pad(CRLF_PAD)
 
 
     def add_title(self, title, rotate=False, invert=False):
         '''Add a human-readable title to the beginning of the buffer.'''
-        
-        # Build the title pattern
-        buf = bytearray('\x00')
-        for char in title:
-            letter = font5x7.font5x7[int(ord(char) & 0x7F)]
-            if rotate:
-                letter = font5x7.rotate_char(letter)
-                if invert:
-                    letter = font5x7.invert_char(letter, 5)
-            else:
-                if invert:
-                    letter = font5x7.invert_char(letter, 7)
-            for column in letter:
-                buf.append(column)
-            buf.append(0x00)
 
-        # Prepend the title to the tape
-        for column in reversed(buf):
-            self.insert(0, column)
+        self[0:0] = title_pattern(title, rotate=rotate, invert=invert)
 
 
     def reverse_bits(self, numbits=8):
         '''Reverse the order of numbits least significant bits of
         each byte in the buffer, discarding more significant bits.'''
 
-        for n in range(len(self)):
-            self[n] = sum(1<<(numbits-1-i) for i in range(numbits) if self[n]>>i&1)
+        self.transform(reverse_table(numbits))
 
 
-    def ascii2tty(self):
+    def ascii2tty(self, figs=None):
         '''Convert from ASCII to 5-level TTY code.
 
         Assumes reader may initially be in either letters or figures
         shift, and emits a shift char prior to first output char that
-        is not valid in either shift.'''
-
-        figs = None
-        buf  = bytearray()
-
-        # Emit initial shift if needed
-        if len(self) > 0:
-            char = tty.asc2tty[self[0] & tty.MSK7]
-            if (char & tty.ETHR_F):
-                # Valid in either shift
-                pass
-            elif (char & tty.FIGS_F):
-                # Must be in figures shift
-                buf.append(tty.FIGS)
-                figs = True
-            else:
-                # Must be in letters shift
-                buf.append(tty.LTRS)
-                figs = False
-        
-        # Convert chars
-        for char in self:
-            # Drop MSB and convert
-            char = tty.asc2tty[char & tty.MSK7]
-
-            # Convert if valid
-            if char != tty.INVC:
-
-                # Emit shift char if needed
-                if (char & tty.ETHR_F):
-                    # Valid in either shift
-                    pass
-                elif (char & tty.FIGS_F):
-                    # Must be in figures shift
-                    if figs is not True:
-                        # Not already in figures shift
-                        # i.e. either in letters shift or indeterminate
-                        buf.append(tty.FIGS)
-                        figs = True
-                elif figs is not False:
-                    # In figures or indeterminate shift, but must be in letter shift
-                    buf.append(tty.LTRS)
-                    figs = False
-
-                # Emit the converted char
-                buf.append(char & tty.MSK5)
+        is not valid in either shift. Set figs to True or False if the
+        reader is known to be in figures or letters shift, e.g. when
+        converting a tape in pieces. Returns the final shift state.'''
+
+        import tty
+
+        # Drop MSBs and invalid chars, and convert the remainder to
+        # 5-level TTY codes tagged with their shift flags
+        codes = str(self.translate(asc2tty_table(), asc2tty_invalid()))
+
+        # Each run of chars requiring the same shift, including any
+        # chars valid in either shift which follow it, is converted
+        # as a whole. Runs alternate between shifts, so a shift char
+        # is needed before each run unless the reader is already in
+        # the required shift.
+        buf = []
+        pos = 0
+        for run in _shift_runs.finditer(codes):
+            if run.start() > pos:
+                # Leading chars valid in either shift
+                buf.append(codes[pos:run.start()])
+            run_figs = (ord(codes[run.start()]) & tty.FIGS_F) != 0
+            if run_figs is not figs:
+                if run_figs:
+                    buf.append(chr(tty.FIGS))
+                else:
+                    buf.append(chr(tty.LTRS))
+                figs = run_figs
+            buf.append(run.group(0))
+            pos = run.end()
+        if pos < len(codes):
+            buf.append(codes[pos:])
 
         # Replace buffer contents with converted data
-        self.clear()
-        self.extend(buf)
+        self[:] = ''.join(buf).translate(and_table(tty.MSK5))
+        return figs
 
 
-    def tty2ascii(self):
+    def tty2ascii(self, figs=False):
         '''Convert from 5-level TTY code to ASCII.
 
-        Assumes initial letters shift state.'''
+        Assumes initial letters shift state, unless figs is True.
+        Returns the final shift state.'''
 
-        figs = False
-        buf  = bytearray()
+        import tty
 
-        # Convert buffer contents
-        for char in self:
-            char = char & tty.MSK5
-            if char == tty.LTRS:
+        # Split into runs between shift chars, and convert each run as
+        # a whole according to the shift in effect
+        buf = []
+        for run in _shift_chars.split(str(self.translate(and_table(tty.MSK5)))):
+            if run == chr(tty.LTRS):
                 figs = False
-            elif char == tty.FIGS:
+            elif run == chr(tty.FIGS):
                 figs = True
+            elif figs:
+                buf.append(run.translate(tty_figs_table()))
             else:
-                if figs:
-                    char = tty.tty_figs2asc[char]
-                else:
-                    char = tty.tty_ltrs2asc[char]
-                buf.append(char)
+                buf.append(run.translate(tty_ltrs_table()))
 
         # Replace buffer contents with converted data
-        self.clear()
-        self.extend(buf)
-
-
-
-    def render_ascii(self, width=8, invert=False):
-        '''Create ASCII art rendering of buffer, in style of bcd(1).'''
-
-        # Leading edge
-        buf = '+'
-        for col in range(width + 1):
-            buf = buf + '-'
-        buf = buf + '+\n'
-
-        # Render the rows
-        for row in self:
-            buf = buf + '|'
-            if invert:
-                for n in reversed(range(width)):
-                    if row & (0x01 << (width-1)):
-                        buf = buf + 'o'
-                    else:
-                        buf = buf + ' '
-                    if n == 3:
-                        buf = buf + '.'
-                    row = row << 1
-            else:
-                for n in range(width):
-                    if row & 0x01:
-                        buf = buf + 'o'
-                    else:
-                        buf = buf + ' '
-                    if n == 2:
-                        buf = buf + '.'
-                    row = row >> 1
-            buf = buf + '|\n'
+        self[:] = ''.join(buf)
+        return figs
+
+
+
+    def window(self, offset=0, length=None):
+        '''Return new tape holding length frames of buffer starting at
+        frame offset, or through the end of the buffer if length is None.'''
+
+        if length is None:
+            return tape(self[offset:])
+        return tape(self[offset:offset + length])
+
+
+    def render_ascii(self, width=8, invert=False, offset=0, length=None):
+        '''Create ASCII art rendering of buffer, in style of bcd(1).
+
+        Only length frames starting at frame offset are rendered, if given.'''
+
+        return ''.join(ascii_art(self, width, invert, offset, length))
+
+
+    def write_ascii(self, f, width=8, invert=False, offset=0, length=None):
+        '''Write ASCII art rendering of buffer, in style of bcd(1), to
+        file object f a block at a time.'''
+
+        for block in ascii_art(self, width, invert, offset, length):
+            f.write(block)
+
+
+    def render_pbm(self, filename, width=8, invert=False, backend=None, jobs=1,
+                   dpi=None, offset=0, length=None):
+        '''Generate PBM image of punched paper tape at dpi pixels per
+        inch, or pbmtape.DPI by default.
+
+        backend may be 'python' or 'numpy' to select the rendering
+        backend; by default, NumPy is used for very large tapes if
+        it is available. If jobs is greater than 1, the image is
+        rendered by a pool of jobs processes. Only length frames
+        starting at frame offset are rendered, if given. The filename
+        '-' writes the image to standard output.'''
+
+        import pbmtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        buf = self
+        if offset or length is not None:
+            buf = self.window(offset, length)
+        pbmtape.pbmtape(tape=buf, filename=filename, width=width, invert=invert,
+                        backend=backend, jobs=jobs, dpi=dpi)
+
+
+    def render_png(self, filename, width=8, invert=False, dpi=None,
+                   offset=0, length=None):
+        '''Generate PNG image of punched paper tape at dpi pixels per
+        inch, or pbmtape.DPI by default.'''
+
+        import pbmtape
+        import pngtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        buf = self
+        if offset or length is not None:
+            buf = self.window(offset, length)
+        pngtape.pngtape(tape=buf, filename=filename, width=width, invert=invert,
+                        dpi=dpi)
 
-        # Trailing edge
-        buf = buf + '+'
-        for col in range(width + 1):
-            buf = buf + '-'
-        buf = buf + '+\n'
 
-        return buf
+    def render_pgm(self, filename, width=8, invert=False, dpi=None,
+                   offset=0, length=None):
+        '''Generate anti-aliased PGM image of punched paper tape at dpi
+        pixels per inch, or pbmtape.DPI by default.'''
 
+        import pbmtape
+        import pgmtape
+        if dpi is None:
+            dpi = pbmtape.DPI
+        buf = self
+        if offset or length is not None:
+            buf = self.window(offset, length)
+        pgmtape.pgmtape(tape=buf, filename=filename, width=width, invert=invert,
+                        dpi=dpi)
 
-    def render_pbm(self, filename, width=8, invert=False):
-        '''Generate PBM image of punched paper tape.'''
 
-        pbmtape.pbmtape(tape=self, filename=filename, width=width, invert=invert)
+    def render_svg(self, filename, width=8, invert=False, offset=0, length=None):
+        '''Generate SVG image of punched paper tape.'''
 
+        import svgtape
+        buf = self
+        if offset or length is not None:
+            buf = self.window(offset, length)
+        svgtape.svgtape(tape=buf, filename=filename, width=width, invert=invert)
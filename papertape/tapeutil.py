@@ -0,0 +1,1034 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Implementation of tapeutil.py, the utility for manipulating images
+of punched paper tapes.
+
+This lives in the package rather than in the script, so that its
+compiled bytecode is cached instead of being compiled at every run.
+It is not imported by import papertape.'''
+
+import os
+import re
+import sys
+import stat
+import signal
+import struct
+import argparse
+import textwrap
+import StringIO
+import papertape
+
+
+# Accumulate arguments in order encountered
+class gather_args(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        if not 'arg_sequence' in namespace:
+            setattr(namespace, 'arg_sequence', [])
+        prev = namespace.arg_sequence
+        prev.append((self.dest, values))
+        setattr(namespace, 'arg_sequence', prev)
+
+
+# Pure per-byte operations, mapped to functions returning their
+# translation tables. Runs of consecutive byte operations are fused into
+# a single table and applied in one pass over the buffer; every other
+# operation acts as a barrier.
+byte_ops = {
+    'set_msb':   lambda opt: papertape.or_table(0x80),
+    'clear_msb': lambda opt: papertape.and_table(0x7F),
+    'rev':       lambda opt: papertape.reverse_table(8),
+    'rev5':      lambda opt: papertape.reverse_table(5),
+    'mask5':     lambda opt: papertape.and_table(0x1F),
+}
+
+# Character deletion operations, mapped to the characters they remove.
+# Runs of consecutive deletions are likewise fused into a single pass.
+strip_ops = {
+    'strip_nul': [0x00],
+    'strip_del': [0x7F],
+}
+
+
+# Image rendering operations, mapped to the tape method used and
+# whether the rendering is inverted.
+render_ops = {
+    'render_pbm':     ('render_pbm', False),
+    'inv_render_pbm': ('render_pbm', True),
+    'render_png':     ('render_png', False),
+    'inv_render_png': ('render_png', True),
+    'render_pgm':     ('render_pgm', False),
+    'inv_render_pgm': ('render_pgm', True),
+    'render_svg':     ('render_svg', False),
+    'inv_render_svg': ('render_svg', True),
+}
+
+# Operations which may be performed directly upon a memory-mapped buffer.
+# Any other operation first takes a private copy of the mapped file.
+mapped_ops = ['save', 'hexdump', 'render_ascii', 'inv_render_ascii'] + render_ops.keys()
+
+# Operations which discard the buffer, and so need no private copy.
+discard_ops = ['clear', 'load', 'map']
+
+# Operations which add data to either end of the buffer, and so are
+# performed upon a segtape, linking the data rather than copying the buffer.
+linked_ops = ['append', 'add_leader', 'add_trailer',
+              'title', 'inv_title', 'rot_title', 'rot_inv_title']
+
+# Operations taking a filename or title, mapped to its position among
+# their options. In batch mode, these are templates.
+template_ops = dict([('load', 0), ('map', 0), ('save', 0), ('title', 0),
+                     ('inv_title', 0), ('rot_title', 0), ('rot_inv_title', 0)] +
+                    [(cmd, 1) for cmd in render_ops])
+
+# Fields of batch mode templates, such as {stem} or {index:04d}
+batch_fields = re.compile(r'\{(path|dir|name|stem|index)(:[^{}]*)?\}')
+
+
+def pad_rule(opt):
+    '''Return (pattern, fill) padding rule from --pad options, which
+    may contain backslash escapes such as \\r or \\x7f.'''
+
+    try:
+        pattern = opt[0].decode('string_escape')
+        fill    = opt[1].decode('string_escape')
+    except ValueError:
+        sys.stderr.write('ERROR: invalid escape sequence in --pad {:s} {:s}\n'.format(opt[0], opt[1]))
+        exit(1)
+    if len(pattern) == 0:
+        sys.stderr.write('ERROR: --pad PATTERN must not be empty.\n')
+        exit(1)
+    return (pattern, fill)
+
+
+def compile_plan(arg_sequence):
+    '''Compile a sequence of (command, options) tuples into an execution plan.
+
+    Each run of consecutive commands listed in byte_ops is replaced by a
+    single ('fused', commands, table) step, and each run of consecutive
+    commands listed in strip_ops by a single ('strip', commands, chars) step.
+    Each run of consecutive --pad commands is replaced by a single
+    ('pad', options, rules) step.'''
+
+    plan = []
+    for cmd, opt in arg_sequence:
+        if cmd in byte_ops:
+            table = byte_ops[cmd](opt)
+            if plan and plan[-1][0] == 'fused':
+                prev = plan.pop()
+                plan.append(('fused', prev[1] + (cmd,),
+                             papertape.compose_tables(prev[2], table)))
+            else:
+                plan.append(('fused', (cmd,), table))
+        elif cmd in strip_ops:
+            if plan and plan[-1][0] == 'strip':
+                prev = plan.pop()
+                plan.append(('strip', prev[1] + (cmd,), prev[2] + strip_ops[cmd]))
+            else:
+                plan.append(('strip', (cmd,), strip_ops[cmd]))
+        elif cmd == 'pad':
+            rule = pad_rule(opt)
+            if plan and plan[-1][0] == 'pad':
+                prev = plan.pop()
+                plan.append(('pad', prev[1] + tuple(opt), prev[2] + [rule]))
+            else:
+                plan.append(('pad', tuple(opt), [rule]))
+        else:
+            plan.append((cmd, opt))
+    return plan
+
+
+def explain_plan(plan):
+    '''Return string describing an execution plan.'''
+
+    buf = 'Execution plan:\n'
+    for n, step in enumerate(plan):
+        if step[0] in ['fused', 'strip', 'pad']:
+            buf = buf + '  {:d}. {:s} {:s} (1 pass)\n'.format(n+1, step[0],
+                                                             ' '.join(step[1]))
+        elif step[1]:
+            buf = buf + '  {:d}. {:s} {:s}\n'.format(n+1, step[0],
+                                                    ' '.join(str(o) for o in step[1]))
+        else:
+            buf = buf + '  {:d}. {:s}\n'.format(n+1, step[0])
+    return buf
+
+
+def window(tapebuf, offset=0, length=None):
+    '''Return tape containing length frames of tapebuf starting at frame
+    offset, or through the end of tapebuf if length is None.
+
+    tapebuf may be a memory-mapped buffer, which is returned itself for
+    the whole buffer, and of which only the window is read otherwise.'''
+
+    if offset == 0 and length is None:
+        return tapebuf
+    return tapebuf.window(offset, length)
+
+
+def page_name(filename, number):
+    '''Return name of file for numbered page of a rendering.
+
+    filename may contain a format field such as {:04d} for the page
+    number; otherwise the number is added before the extension.'''
+
+    if '{' in filename:
+        return filename.format(number)
+    root, ext = os.path.splitext(filename)
+    return '{:s}-{:04d}{:s}'.format(root, number, ext)
+
+
+def render_image(tapebuf, cmd, filename, width, jobs=1, dpi=1000,
+                 offset=0, length=None, page=None):
+    '''Render the window of tapebuf of length frames starting at offset
+    as an image, using the tape method and orientation given for cmd in
+    render_ops. If page is given, the window is split into pages of page
+    frames, each rendered from its own slice into a numbered file.'''
+
+    method, invert = render_ops[cmd]
+    kwargs = {'width': width, 'invert': invert}
+    if method in ['render_pbm', 'render_png', 'render_pgm']:
+        kwargs['dpi'] = dpi
+    if method == 'render_pbm':
+        kwargs['jobs'] = jobs
+
+    end = len(tapebuf)
+    if length is not None:
+        end = min(end, offset + length)
+
+    if not page:
+        getattr(window(tapebuf, offset, length), method)(filename=filename, **kwargs)
+    else:
+        for number, start in enumerate(range(offset, end, page)):
+            getattr(window(tapebuf, start, min(page, end - start)), method)(
+                filename=page_name(filename, number + 1), **kwargs)
+
+
+def run_plan(plan, tapebuf, jobs=1, dpi=1000, offset=0, length=None, page=None):
+    '''Execute each step of an execution plan upon tapebuf, using up to
+    jobs processes for operations which may be parallelized, and
+    rendering images at dpi pixels per inch. Renderings show length
+    frames starting at frame offset, optionally split into pages of
+    page frames.
+
+    Returns the resulting buffer, which may be a different object from
+    tapebuf if a file was mapped, a mapped buffer was modified, or data
+    was linked to either end of the buffer.'''
+
+    for step in plan:
+        cmd = step[0]
+        opt = step[1]
+
+        if cmd in linked_ops and not isinstance(tapebuf, papertape.segtape):
+            tapebuf = papertape.segtape(tapebuf)
+        elif isinstance(tapebuf, papertape.maptape):
+            if cmd in discard_ops:
+                tapebuf = papertape.tape()
+            elif cmd not in mapped_ops:
+                tapebuf = tapebuf.tape()
+
+        if cmd == 'fused':
+            tapebuf.transform(step[2])
+
+        elif cmd == 'strip':
+            tapebuf.strip_char(step[2])
+
+        elif cmd == 'clear':
+            tapebuf.clear()
+
+        elif cmd == 'load':
+            tapebuf.load(opt[0], append=False)
+
+        elif cmd == 'map':
+            tapebuf = papertape.maptape(opt[0])
+
+        elif cmd == 'append':
+            tapebuf.load(opt[0], append=True)
+
+        elif cmd == 'save':
+            tapebuf.save(opt[0])
+
+        elif cmd == 'hexdump':
+            for block in papertape.hex_dump(tapebuf, offset, length):
+                sys.stdout.write(block)
+            sys.stdout.write('\n')
+
+        elif cmd == 'trim':
+            tapebuf.trim()
+
+        elif cmd == 'add_leader':
+            tapebuf.add_leader(length = int(opt[0] * 10))
+
+        elif cmd == 'add_trailer':
+            tapebuf.add_trailer(length = int(opt[0] * 10))
+
+        elif cmd == 'pad_crlf':
+            tapebuf.pad_crlf()
+
+        elif cmd == 'pad':
+            tapebuf.pad(step[2])
+
+        elif cmd == 'title':
+            tapebuf.add_title(title=opt[0], rotate=False, invert=False)
+
+        elif cmd == 'inv_title':
+            tapebuf.add_title(title=opt[0], rotate=False, invert=True)
+
+        elif cmd == 'rot_title':
+            tapebuf.add_title(title=opt[0], rotate=True, invert=False)
+
+        elif cmd == 'rot_inv_title':
+            tapebuf.add_title(title=opt[0], rotate=True, invert=True)
+
+        elif cmd == 'ascii2tty':
+            tapebuf.ascii2tty()
+
+        elif cmd == 'tty2ascii':
+            tapebuf.tty2ascii()
+
+        elif cmd == 'render_ascii':
+            for block in papertape.ascii_art(tapebuf, opt[0], False, offset, length):
+                sys.stdout.write(block)
+            sys.stdout.write('\n')
+            
+        elif cmd == 'inv_render_ascii':
+            for block in papertape.ascii_art(tapebuf, opt[0], True, offset, length):
+                sys.stdout.write(block)
+            sys.stdout.write('\n')
+
+        elif cmd in render_ops:
+            if int(opt[0]) not in [5,8]:
+                sys.stderr.write('ERROR: --{:s} width must be 5 or 8.\n'.format(render_ops[cmd][0]))
+                exit(1)
+            if page and opt[1] == '-':
+                sys.stderr.write('ERROR: --page cannot be used with output to stdout.\n')
+                exit(1)
+            render_image(tapebuf, cmd, filename=opt[1], width=int(opt[0]),
+                         jobs=jobs, dpi=dpi, offset=offset, length=length, page=page)
+            
+        else:
+            sys.stderr.write('Internal parser error: Unexpected argument "{:s}".'.format(cmd))
+            exit(1)
+
+    return tapebuf
+
+
+def batch_name(template, path, index):
+    '''Return filename or title from template for batch input file path, the
+    index'th input of the batch. Fields {path}, {dir}, {name}, {stem}
+    and {index} are replaced, and any other braces are left in place.'''
+
+    fields = {'path':  path,
+              'dir':   os.path.dirname(path) or '.',
+              'name':  os.path.basename(path),
+              'stem':  os.path.splitext(os.path.basename(path))[0],
+              'index': index}
+    return batch_fields.sub(lambda m: ('{' + (m.group(2) or '') + '}').format(fields[m.group(1)]),
+                            template)
+
+
+def batch_plan(plan, path, index):
+    '''Return execution plan with filename and title templates filled
+    in for batch input file path, the index'th input of the batch.'''
+
+    steps = []
+    for step in plan:
+        if step[0] in template_ops:
+            opt = list(step[1])
+            n   = template_ops[step[0]]
+            opt[n] = batch_name(opt[n], path, index)
+            step = (step[0], opt) + tuple(step[2:])
+        steps.append(step)
+    return steps
+
+
+def batch_inputs(patterns):
+    '''Return list of batch input files matching glob patterns. A
+    pattern of - reads a list of filenames from stdin, one per line.'''
+
+    import glob
+    paths = []
+    for pattern in patterns:
+        if pattern == '-':
+            paths.extend(line.rstrip('\r\n') for line in sys.stdin if line.strip())
+        else:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                # Unmatched names are reported as errors by the batch
+                matches = [pattern]
+            paths.extend(matches)
+    return paths
+
+
+def run_batch_file(task):
+    '''Execute an execution plan upon one batch input file, which is
+    first mapped into the buffer. Returns (index, path, error), where
+    error is None on success or a message describing why the file failed.
+
+    Errors are caught, so that one failing file does not abort the batch.'''
+
+    plan, path, index, options = task
+    stderr     = sys.stderr
+    sys.stderr = StringIO.StringIO()
+    error      = None
+    tapebuf    = None
+    try:
+        tapebuf = run_plan(batch_plan([('map', [path])] + plan, path, index),
+                           papertape.tape(), **options)
+    except SystemExit:
+        error = sys.stderr.getvalue().strip() or 'failed'
+    except Exception as e:
+        error = 'ERROR: {:s}'.format(str(e))
+    finally:
+        sys.stderr = stderr
+    if isinstance(tapebuf, (papertape.maptape, papertape.segtape)):
+        tapebuf.close()
+    return (index, path, error)
+
+
+def run_batch(plan, paths, jobs=1, **options):
+    '''Execute an execution plan upon each of the batch input files
+    in paths, using a pool of jobs processes. Returns list of
+    (path, error) tuples for the files which failed, in batch order.'''
+
+    tasks = [(plan, path, index, options) for index, path in enumerate(paths)]
+    if jobs > 1 and len(tasks) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = sorted(pool.imap_unordered(run_batch_file, tasks, chunksize=16))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(run_batch_file, tasks)
+    return [(path, error) for index, path, error in results if error]
+
+
+def stream_stage(step):
+    '''Return papertape.stream pipeline stage performing an execution
+    plan step, or None if the step cannot be performed upon a stream.'''
+
+    cmd = step[0]
+    opt = step[1]
+
+    if cmd == 'fused':
+        return papertape.mapstage(papertape.tape.transform, step[2])
+
+    elif cmd == 'strip':
+        return papertape.mapstage(papertape.tape.strip_char, step[2])
+
+    elif cmd == 'trim':
+        return papertape.trimstage()
+
+    elif cmd == 'add_leader':
+        return papertape.prefixstage('\x00' * int(opt[0] * 10))
+
+    elif cmd == 'add_trailer':
+        return papertape.suffixstage('\x00' * int(opt[0] * 10))
+
+    elif cmd == 'pad_crlf':
+        return papertape.crlfstage()
+
+    elif cmd == 'pad':
+        return papertape.padstage(step[2])
+
+    elif cmd in ['title', 'inv_title', 'rot_title', 'rot_inv_title']:
+        return papertape.prefixstage(
+            papertape.title_pattern(title=opt[0], rotate=cmd.startswith('rot'),
+                                    invert=('inv' in cmd)))
+
+    elif cmd == 'ascii2tty':
+        return papertape.ascii2ttystage()
+
+    elif cmd == 'tty2ascii':
+        return papertape.tty2asciistage()
+
+    return None
+
+
+def run_stream(plan, infilename, outfilename, chunk_size):
+    '''Execute an execution plan upon a stream read from infilename
+    and written to outfilename, either of which may be '-' for
+    stdin or stdout.'''
+
+    stages = []
+    for step in plan:
+        stage = stream_stage(step)
+        if stage is None:
+            sys.stderr.write('ERROR: --{:s} cannot be used with --stream.\n'.format(step[0]))
+            exit(1)
+        stages.append(stage)
+
+    if infilename == '-':
+        infile = sys.stdin
+    else:
+        infile = open(infilename, 'rb')
+    if outfilename == '-':
+        outfile = sys.stdout
+    else:
+        outfile = open(outfilename, 'wb')
+
+    papertape.stream(infile, outfile, stages, chunk_size=chunk_size)
+
+    if infile is not sys.stdin:
+        infile.close()
+    if outfile is not sys.stdout:
+        outfile.close()
+
+
+def send_message(sock, message):
+    '''Send message, a JSON-serializable object, over a server socket.
+
+    Each message is a JSON document preceded by its length as a 4-byte
+    big-endian integer. tapeclient.py frames its messages the same way.'''
+
+    import json
+    data = json.dumps(message)
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def recv_exactly(sock, size):
+    '''Return size bytes read from sock, or None if the connection was
+    closed first.'''
+
+    data = []
+    while size > 0:
+        block = sock.recv(min(size, 65536))
+        if not block:
+            return None
+        data.append(block)
+        size = size - len(block)
+    return ''.join(data)
+
+
+def recv_message(sock):
+    '''Return next message received over a server socket, or None if
+    the connection was closed.'''
+
+    head = recv_exactly(sock, 4)
+    if head is None:
+        return None
+    data = recv_exactly(sock, struct.unpack('>I', head)[0])
+    if data is None:
+        return None
+    import json
+    return json.loads(data)
+
+
+# Parser used by server worker processes, set before they are started
+_server_parser = None
+
+
+def _init_worker():
+    # Server worker processes leave ^C to the server process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def serve_request(request):
+    '''Execute a server request in a server worker process, and return
+    the response.
+
+    A request holds the list of command-line arguments in 'argv', the
+    working directory in which to interpret them in 'cwd', and optionally
+    the data to provide on stdin in 'stdin', each base64-encoded so that
+    any bytes may be passed, as on a command line. The response
+    holds the base64-encoded stdout and stderr output of the request in
+    'stdout' and 'stderr', and its exit status in 'status'.'''
+
+    import base64
+    stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+    cwd        = os.getcwd()
+    sys.stdout = StringIO.StringIO()
+    sys.stderr = StringIO.StringIO()
+    status     = 0
+    try:
+        sys.stdin = StringIO.StringIO(base64.b64decode(request.get('stdin', '')))
+        argv      = [base64.b64decode(arg) for arg in request['argv']]
+        if 'cwd' in request:
+            os.chdir(base64.b64decode(request['cwd']))
+        main(argv, parser=_server_parser, worker=True)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            sys.stderr.write('{:s}\n'.format(e.code))
+            status = 1
+    except Exception as e:
+        sys.stderr.write('ERROR: {:s}\n'.format(str(e)))
+        status = 1
+    finally:
+        response = {'status': status,
+                    'stdout': base64.b64encode(sys.stdout.getvalue()),
+                    'stderr': base64.b64encode(sys.stderr.getvalue())}
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+        os.chdir(cwd)
+    return response
+
+
+def bad_request(reason):
+    '''Return response to a server request which could not be decoded.'''
+
+    import base64
+    return {'status': 1,
+            'stdout': '',
+            'stderr': base64.b64encode('ERROR: malformed server request: {:s}\n'.format(reason))}
+
+
+def serve(socketname, parser, jobs=1):
+    '''Serve requests on Unix domain socket socketname until interrupted
+    or terminated, executing them on a pool of jobs worker processes.
+    parser is the command-line argument parser used by the workers.'''
+
+    global _server_parser
+    import SocketServer
+
+    # The server classes are defined here, so that SocketServer is
+    # only imported when serving.
+    class tape_handler(SocketServer.BaseRequestHandler):
+        '''Handler for a connection to the server, which may carry any
+        number of requests. Each request is passed to the worker pool.'''
+
+        def handle(self):
+            while True:
+                try:
+                    request = recv_message(self.request)
+                except ValueError as e:
+                    # The frame was received whole, so later requests
+                    # on the connection may still be served.
+                    send_message(self.request, bad_request(str(e)))
+                    continue
+                if request is None:
+                    break
+                if not isinstance(request, dict) or not isinstance(request.get('argv'), list):
+                    send_message(self.request, bad_request('argv must be a list of arguments'))
+                    continue
+                send_message(self.request, self.server.pool.apply(serve_request, (request,)))
+
+    class tape_server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+        '''Unix domain socket server, handling each connection in its own thread.'''
+
+        daemon_threads = True
+
+    # Replace a socket left behind by a previous server
+    if os.path.exists(socketname):
+        if not stat.S_ISSOCK(os.stat(socketname).st_mode):
+            sys.stderr.write('ERROR: {:s} exists and is not a socket.\n'.format(socketname))
+            exit(1)
+        os.unlink(socketname)
+
+    # Workers are started before any threads, and inherit the parser
+    import multiprocessing
+    _server_parser = parser
+    pool   = multiprocessing.Pool(jobs, _init_worker)
+    server = tape_server(socketname, tape_handler)
+    server.pool = pool
+    sys.stderr.write('Serving on {:s} with {:d} worker(s). Press ^C to exit.\n'.format(socketname, jobs))
+
+    # Shut down cleanly when terminated, as when interrupted
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+        pool.join()
+        os.unlink(socketname)
+
+
+def make_parser():
+    '''Return the command-line argument parser.'''
+
+    parser = argparse.ArgumentParser(
+        prog='tapeutil.py',
+        description=textwrap.dedent('''\
+        Punched paper tape image utility version {:s}
+          {:s}
+          {:s}
+          {:s}
+
+        Arguments are processed in the order encountered, with cumulative effects
+        upon the tape image buffer. The tape image buffer is discarded at program
+        exit, so the final argument should generally be one which outputs the
+        buffer to a file, the screen, or a tape punch. Arguments may be abbreviated.\
+        '''.format(papertape.__version__, papertape.__copyright__,
+                       papertape.__pkg_url__, papertape.__dl_url__)),
+        epilog=textwrap.dedent('''\
+        Example:
+          tapeutil.py --load myfile.txt --pad_crlf --set_msb \\
+                      --add_leader 2 --title "MY TAPE" \\
+                      --add_leader 5 --add_trailer 5 --save myfile.tap'''),
+        add_help=True,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+
+    parser.add_argument('--explain', action='store_true',
+                        help='''Print the execution plan, showing which consecutive
+                        per-byte operations have been fused into a single pass,
+                        before processing the buffer.''')
+
+    parser.add_argument('--stream', action='store', nargs=2,
+                        metavar=('INPUT', 'OUTPUT'),
+                        help='''Process the tape image as a stream read from file INPUT
+                        and written to file OUTPUT in fixed-size chunks, so that
+                        memory use is independent of tape length. Either filename
+                        may be - for stdin or stdout. Only operations which modify
+                        the buffer may be used, and they may not load or save it.''')
+
+    parser.add_argument('--batch', action='store', nargs='+',
+                        metavar='INPUT',
+                        help='''Process each file matching the INPUT glob patterns
+                        in turn, mapping it into the buffer before the other
+                        arguments are applied to it. INPUT may be - to read a
+                        list of filenames from stdin. Filenames and titles given
+                        to other arguments are templates in which {path}, {dir},
+                        {name}, {stem} and {index} are replaced with the path,
+                        directory, name and name without extension of each input
+                        file, and its position in the batch, e.g. out/{stem}.pbm.
+                        Files are
+                        processed by --jobs processes, and a file which fails does
+                        not stop the batch. Failures are listed at the end.''')
+
+    parser.add_argument('--serve', action='store', nargs=1,
+                        metavar='SOCKET',
+                        help='''Serve requests on the Unix domain socket SOCKET until
+                        interrupted, executing each by one of --jobs worker processes.
+                        Each request carries the arguments of one tapeutil.py
+                        command, as sent by tapeclient.py, and returns its output and
+                        exit status. This avoids interpreter startup for each tape.''')
+
+    parser.add_argument('--chunk_size', action='store', nargs=1,
+                        metavar='BYTES', type=int,
+                        default=[65536],
+                        help='Chunk size used by --stream. Defaults to 65536.')
+
+    parser.add_argument('--jobs', action='store', nargs=1,
+                        metavar='N', type=int, default=[1],
+                        help='''Use N processes for --render_pbm and --inv_render_pbm,
+                        for the files of --batch, or for the requests of --serve.
+                        Defaults to 1.''')
+
+    parser.add_argument('--dpi', action='store', nargs=1,
+                        metavar='DPI', type=int, default=[1000],
+                        help='''Render images at DPI pixels per inch. Defaults to 1000.
+                        At low resolutions, --render_pgm gives better results.''')
+
+    parser.add_argument('--offset', action='store', nargs=1,
+                        metavar='FRAMES', type=lambda x: int(x, 0), default=[0],
+                        help='''Start renderings and hex dumps at frame number FRAMES
+                        of the buffer, which may be given in hex with a 0x prefix.
+                        Defaults to 0.''')
+
+    parser.add_argument('--length', action='store', nargs=1,
+                        metavar='FRAMES', type=lambda x: int(x, 0), default=[None],
+                        help='''Limit renderings and hex dumps to FRAMES frames of the
+                        buffer, which may be given in hex with a 0x prefix.
+                        Defaults to the remainder of the buffer.''')
+
+    parser.add_argument('--page', action='store', nargs=1,
+                        metavar='FRAMES', type=int, default=[None],
+                        help='''Split image renderings into pages of FRAMES frames,
+                        written to numbered files. The page number replaces a
+                        format field such as {:04d} in the file name, or is
+                        otherwise added before the file name extension.''')
+
+    parser.add_argument('--clear', action=gather_args, nargs=0,
+                        help='Clear the tape image buffer.')
+
+    parser.add_argument('--load', action=gather_args, nargs=1,
+                        metavar='FILENAME',
+                        help='''Load tape image buffer from file, replacing previous
+                        buffer contents.''')
+
+    parser.add_argument('--map', action=gather_args, nargs=1,
+                        metavar='FILENAME',
+                        help='''Map file into tape image buffer without reading it
+                        into memory, replacing previous buffer contents. A private
+                        copy is made only when the buffer is first modified, and
+                        an unmodified buffer is saved directly from the file.''')
+
+    parser.add_argument('--append', action=gather_args, nargs=1,
+                        metavar='FILENAME',
+                        help='''Load tape image buffer from file, appending to previous
+                        buffer contents.''')
+
+    parser.add_argument('--save', action=gather_args, nargs=1,
+                        metavar='FILENAME',
+                        help='Save tape image buffer to file.')
+
+    parser.add_argument('--hexdump', action=gather_args, nargs=0,
+                        help='''Print a hex dump to stdout. Most significant bit
+                        (bit number ) will be ignored for the ASCII representation.''')
+
+    parser.add_argument('--trim', action=gather_args, nargs=0,
+                        help='Trim leader and trailer of NUL chars from buffer.')
+
+    parser.add_argument('--add_leader', action=gather_args, nargs=1,
+                        metavar='INCHES', type=float,
+                        help='Add NUL leader to buffer.')
+
+    parser.add_argument('--add_trailer', action=gather_args, nargs=1,
+                        metavar='INCHES', type=float,
+                        help='Add NUL trailer to buffer.')
+
+    parser.add_argument('--strip_nul', action=gather_args, nargs=0,
+                        help='Remove all NUL chars from buffer.')
+
+    parser.add_argument('--strip_del', action=gather_args, nargs=0,
+                        help='Remove all DEL chars from buffer.')
+
+    parser.add_argument('--set_msb', action=gather_args, nargs=0,
+                        help='''Set most significant bit (bit number 7) of all
+                        chars in buffer.''')
+
+    parser.add_argument('--clear_msb', action=gather_args, nargs=0,
+                        help='''Clear most significant bit (bit number 7) of all
+                        chars in buffer.''')
+
+    parser.add_argument('--pad_crlf', action=gather_args, nargs=0,
+                        help='Add two DEL chars after each CR-LF sequence in buffer.')
+
+    parser.add_argument('--pad', action=gather_args, nargs=2,
+                        metavar=('PATTERN', 'FILL'),
+                        help='''Add FILL chars after each occurrence of PATTERN in
+                        buffer. PATTERN and FILL may contain escape sequences such
+                        as \\r, \\n, \\f or \\x7f. Consecutive --pad options are
+                        applied together in a single pass, preferring the longest
+                        PATTERN where patterns overlap, and FILL chars are not
+                        themselves padded. E.g. --pad '\\r' '\\x00\\x00'
+                        --pad '\\f' '\\x7f\\x7f\\x7f\\x7f'.''')
+
+    parser.add_argument('--title', action=gather_args, nargs=1,
+                        metavar='TITLE',
+                        help='''Add human-readable title to beginning of buffer,
+                        using a font composed of 5x7 punched hole patterns. Title
+                        will be right side up for tapes following ECMA-10 standard,
+                        but inverted on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--inv_title', action=gather_args, nargs=1,
+                        metavar='TITLE',
+                        help='''Add human-readable title to beginning of buffer,
+                        using a font composed of 5x7 punched hole patterns. Title
+                        will be right side up on machines like the Teletype 33 ASR,
+                        but inverted on tapes following ECMA-10 standard.''')
+
+    parser.add_argument('--rot_title', action=gather_args, nargs=1,
+                        metavar='TITLE',
+                        help='''Add human-readable title to beginning of buffer,
+                        using a font composed of 5x7 punched hole patterns. Rotate the
+                        letters to fit on a 5-bit tape. Title
+                        will be right side up for tapes following ECMA-10 standard,
+                        but inverted on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--rot_inv_title', action=gather_args, nargs=1,
+                        metavar='TITLE',
+                        help='''Add human-readable title to beginning of buffer,
+                        using a font composed of 5x7 punched hole patterns. Rotate the
+                        letters to fit on a 5-bit tape. Title
+                        will be right side up on machines like the Teletype 33 ASR,
+                        but inverted on tapes following ECMA-10 standard.''')
+
+    parser.add_argument('--rev', action=gather_args, nargs=0,
+                        help='Reverse the bit order of each byte in buffer.')
+
+    parser.add_argument('--rev5', action=gather_args, nargs=0,
+                        help='''Reverse the bit order of 5 LSBs of each byte in buffer,
+                        discarding MSBs.''')
+
+    parser.add_argument('--mask5', action=gather_args, nargs=0,
+                        help='''Mask lower 5 bits of entire buffer in order to clear MSBs
+                        of a 5-level tape read on an 8 bit reader.''')
+
+    parser.add_argument('--ascii2tty', action=gather_args, nargs=0,
+                        help='Translate entire buffer from ASCII to 5-level TTY coding.')
+
+    parser.add_argument('--tty2ascii', action=gather_args, nargs=0,
+                        help='Translate entire buffer from 5-level TTY to ASCII coding.')
+
+    parser.add_argument('--render_ascii', action=gather_args, nargs=1,
+                        metavar='WIDTH', type=int,
+                        choices=[5,8],
+                        help='''Create an ASCII art rendering of a punched tape,
+                        in a style similar to the bcd(1) program. WIDTH specifies the
+                        tape width in bits, and must be 5 or 8. Rendering will be printed
+                        to stdout. Leading edge of tape will be at top.
+                        Tape will be top side up on ECMA-10 compliant machines,
+                        or top side down on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--inv_render_ascii', action=gather_args, nargs=1,
+                        metavar='WIDTH', type=int,
+                        choices=[5,8],
+                        help='''Create an ASCII art rendering of a punched tape,
+                        in a style similar to the bcd(1) program. WIDTH specifies the
+                        tape width in bits, and must be 5 or 8. Rendering will be printed
+                        to stdout. Leading edge of tape will be at top.
+                        Tape will be top side up on machines like the Teletype 33 ASR,
+                        or top side down on ECMA-10 compliant machines.''')
+
+    parser.add_argument('--render_pbm', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a rendering of a punched tape in Portable
+                        Bitmap (.pbm) format, with each pixel representing 0.001
+                        inches unless --dpi is given. WIDTH specifies the tape
+                        width in bits, and must be 5 or 8. Leading edge of tape
+                        will be at top.
+                        Tape will be top side up on ECMA-10 compliant machines,
+                        or top side down on machines like the Teletype 33 ASR.
+                        FILENAME may be - to write the image to stdout.''')
+
+    parser.add_argument('--inv_render_pbm', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a rendering of a punched tape in Portable
+                        Bitmap (.pbm) format, with each pixel representing 0.001
+                        inches unless --dpi is given. WIDTH specifies the tape
+                        width in bits, and must be 5 or 8. Leading edge of tape
+                        will be at top.
+                        Tape will be top side up on machines like the Teletype 33 ASR,
+                        or top side down on ECMA-10 compliant machines.
+                        FILENAME may be - to write the image to stdout.''')
+
+    parser.add_argument('--render_png', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a rendering of a punched tape in Portable
+                        Network Graphics (.png) format, with each pixel representing
+                        0.001 inches unless --dpi is given. WIDTH specifies the tape
+                        width in bits, and must be 5 or 8. Leading edge of tape
+                        will be at top.
+                        Tape will be top side up on ECMA-10 compliant machines,
+                        or top side down on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--inv_render_png', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a rendering of a punched tape in Portable
+                        Network Graphics (.png) format, with each pixel representing
+                        0.001 inches unless --dpi is given. WIDTH specifies the tape
+                        width in bits, and must be 5 or 8. Leading edge of tape
+                        will be at top.
+                        Tape will be top side up on machines like the Teletype 33 ASR,
+                        or top side down on ECMA-10 compliant machines.''')
+
+    parser.add_argument('--render_pgm', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create an anti-aliased rendering of a punched tape in
+                        Portable Graymap (.pgm) format, suitable for thumbnails at
+                        low --dpi settings. WIDTH specifies the tape width in bits,
+                        and must be 5 or 8. Leading edge of tape will be at top.
+                        Tape will be top side up on ECMA-10 compliant machines,
+                        or top side down on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--inv_render_pgm', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create an anti-aliased rendering of a punched tape in
+                        Portable Graymap (.pgm) format, suitable for thumbnails at
+                        low --dpi settings. WIDTH specifies the tape width in bits,
+                        and must be 5 or 8. Leading edge of tape will be at top.
+                        Tape will be top side up on machines like the Teletype 33 ASR,
+                        or top side down on ECMA-10 compliant machines.''')
+
+    parser.add_argument('--render_svg', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a vector rendering of a punched tape in Scalable
+                        Vector Graphics (.svg) format. WIDTH specifies the tape width
+                        in bits, and must be 5 or 8. Leading edge of tape will be at top.
+                        Tape will be top side up on ECMA-10 compliant machines,
+                        or top side down on machines like the Teletype 33 ASR.''')
+
+    parser.add_argument('--inv_render_svg', action=gather_args, nargs=2,
+                        metavar=('WIDTH', 'FILENAME'),
+                        help='''Create a vector rendering of a punched tape in Scalable
+                        Vector Graphics (.svg) format. WIDTH specifies the tape width
+                        in bits, and must be 5 or 8. Leading edge of tape will be at top.
+                        Tape will be top side up on machines like the Teletype 33 ASR,
+                        or top side down on ECMA-10 compliant machines.''')
+
+    return parser
+
+
+def main(argv=None, parser=None, worker=False):
+    '''Process command-line arguments argv, or sys.argv[1:] by default.
+
+    worker is True when called by a server worker process, which may
+    neither serve nor start further processes of its own.'''
+
+    # This is the in-memory buffer of the tape image
+    tapebuf = papertape.tape()
+
+    # Parse the command-line arguments. Need to create empty arg_sequence
+    # in case no command-line arguments were included.
+    if parser is None:
+        parser = make_parser()
+    args = parser.parse_args(argv)
+    if not 'arg_sequence' in args:
+        setattr(args, 'arg_sequence', [])
+    if args.jobs[0] < 1:
+        sys.stderr.write('ERROR: --jobs must be at least 1.\n')
+        exit(1)
+    if worker:
+        if args.serve:
+            sys.stderr.write('ERROR: --serve cannot be used by a server request.\n')
+            exit(1)
+        args.jobs = [1]
+    if args.serve:
+        if args.arg_sequence or args.stream or args.batch:
+            sys.stderr.write('ERROR: --serve cannot be used with other operations.\n')
+            exit(1)
+        serve(args.serve[0], parser, jobs=args.jobs[0])
+        return
+
+    if args.offset[0] < 0 or (args.length[0] is not None and args.length[0] < 0):
+        sys.stderr.write('ERROR: --offset and --length must not be negative.\n')
+        exit(1)
+    if args.page[0] is not None and args.page[0] < 1:
+        sys.stderr.write('ERROR: --page must be at least 1 frame.\n')
+        exit(1)
+    if args.dpi[0] < 1:
+        sys.stderr.write('ERROR: --dpi must be positive.\n')
+        exit(1)
+    if args.chunk_size[0] < 1:
+        sys.stderr.write('ERROR: --chunk_size must be at least 1 byte.\n')
+        exit(1)
+
+    # Fuse consecutive per-byte operations, then execute the plan.
+    plan = compile_plan(args.arg_sequence)
+    if args.explain:
+        sys.stderr.write(explain_plan(plan) + '\n')
+    if args.stream and args.batch:
+        sys.stderr.write('ERROR: --stream cannot be used with --batch.\n')
+        exit(1)
+    if args.stream:
+        run_stream(plan, args.stream[0], args.stream[1], args.chunk_size[0])
+    elif args.batch:
+        # Each file of the batch is rendered by a single process
+        paths  = batch_inputs(args.batch)
+        failed = run_batch(plan, paths, jobs=args.jobs[0], dpi=args.dpi[0],
+                           offset=args.offset[0], length=args.length[0],
+                           page=args.page[0])
+        for path, error in failed:
+            sys.stderr.write('{:s}: {:s}\n'.format(path, error.replace('\n', '\n  ')))
+        if failed:
+            sys.stderr.write('ERROR: {:d} of {:d} files failed.\n'.format(len(failed), len(paths)))
+            exit(1)
+    else:
+        tapebuf = run_plan(plan, tapebuf, jobs=args.jobs[0], dpi=args.dpi[0],
+                           offset=args.offset[0], length=args.length[0],
+                           page=args.page[0])
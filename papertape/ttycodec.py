@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''5-level TTY codec for Python's codecs module.
+
+Importing this module registers the codec under the names in
+CODEC_NAMES, after which text may be converted with e.g.
+u'HELLO'.encode('tty5') and data.decode('tty5'). The incremental
+encoder and decoder carry the letters/figures shift state across calls,
+so data arriving in pieces from a reader or socket may be converted as
+it arrives.
+
+Encoding follows tape.ascii2tty(), mapping lower case to upper case.
+Characters with no 5-level TTY equivalent are handled according to the
+errors argument as for any other codec: 'strict' raises
+UnicodeEncodeError, 'ignore' drops them as tape.ascii2tty() does, and
+'replace' substitutes '?'. Decoding follows tape.tty2ascii().'''
+
+import re
+import codecs
+
+from tape import tape, asc2tty_invalid
+
+CODEC_NAMES = ['tty5', 'ita2']
+
+# Shift state values for getstate()/setstate()
+_states = {None: 0, False: 1, True: 2}
+_figs   = dict((v, k) for k, v in _states.items())
+
+# Pattern matching runs of characters with no 5-level TTY code, built on first use
+_unencodable = None
+
+
+def unencodable():
+    '''Return compiled pattern matching runs of characters with no
+    5-level TTY code.'''
+
+    global _unencodable
+    if _unencodable is None:
+        chars = ''.join('\\x{:02x}'.format(ord(c)) for c in asc2tty_invalid() if ord(c) < 0x80)
+        _unencodable = re.compile(u'[' + chars + u'\x80-\uffff]+')
+    return _unencodable
+
+
+def encode(input, errors='strict', figs=None):
+    '''Encode text to 5-level TTY code.
+
+    Returns (data, consumed, figs), where figs is the final shift state.'''
+
+    if isinstance(input, str):
+        input = input.decode('ascii', errors)
+
+    # Pass runs of unencodable characters to the error handler
+    pattern = unencodable()
+    parts   = []
+    pos     = 0
+    match   = pattern.search(input)
+    while match:
+        parts.append(input[pos:match.start()])
+        if errors == 'ignore':
+            pos = match.end()
+        else:
+            error = UnicodeEncodeError(CODEC_NAMES[0], input, match.start(), match.end(),
+                                       'character has no 5-level TTY code')
+            replacement, pos = codecs.lookup_error(errors)(error)
+            if pattern.search(replacement):
+                raise error
+            parts.append(replacement)
+        match = pattern.search(input, pos)
+    parts.append(input[pos:])
+
+    buf  = tape(u''.join(parts).encode('ascii'))
+    figs = buf.ascii2tty(figs=figs)
+    return (str(buf), len(input), figs)
+
+
+def decode(input, errors='strict', figs=False):
+    '''Decode 5-level TTY code to text.
+
+    Returns (text, consumed, figs), where figs is the final shift state.'''
+
+    buf  = tape(input)
+    figs = buf.tty2ascii(figs=figs)
+    return (str(buf).decode('ascii', errors), len(input), figs)
+
+
+class tty_codec(codecs.Codec):
+    '''Stateless 5-level TTY codec.'''
+
+    def encode(self, input, errors='strict'):
+        return encode(input, errors)[:2]
+
+    def decode(self, input, errors='strict'):
+        return decode(input, errors)[:2]
+
+
+class tty_encoder(codecs.IncrementalEncoder):
+    '''Incremental 5-level TTY encoder, carrying shift state across calls.'''
+
+    def __init__(self, errors='strict'):
+        codecs.IncrementalEncoder.__init__(self, errors)
+        self.figs = None
+
+    def encode(self, input, final=False):
+        data, consumed, self.figs = encode(input, self.errors, self.figs)
+        return data
+
+    def reset(self):
+        self.figs = None
+
+    def getstate(self):
+        return _states[self.figs]
+
+    def setstate(self, state):
+        self.figs = _figs[state]
+
+
+class tty_decoder(codecs.IncrementalDecoder):
+    '''Incremental 5-level TTY decoder, carrying shift state across calls.'''
+
+    def __init__(self, errors='strict'):
+        codecs.IncrementalDecoder.__init__(self, errors)
+        self.figs = False
+
+    def decode(self, input, final=False):
+        text, consumed, self.figs = decode(input, self.errors, self.figs)
+        return text
+
+    def reset(self):
+        self.figs = False
+
+    def getstate(self):
+        return ('', _states[self.figs])
+
+    def setstate(self, state):
+        self.figs = _figs[state[1]]
+
+
+class tty_streamwriter(codecs.StreamWriter):
+    '''5-level TTY stream writer, carrying shift state across writes.'''
+
+    def __init__(self, stream, errors='strict'):
+        codecs.StreamWriter.__init__(self, stream, errors)
+        self.figs = None
+
+    def encode(self, input, errors='strict'):
+        data, consumed, self.figs = encode(input, errors, self.figs)
+        return (data, consumed)
+
+    def reset(self):
+        self.figs = None
+
+
+class tty_streamreader(codecs.StreamReader):
+    '''5-level TTY stream reader, carrying shift state across reads.'''
+
+    def __init__(self, stream, errors='strict'):
+        codecs.StreamReader.__init__(self, stream, errors)
+        self.figs = False
+
+    def decode(self, input, errors='strict'):
+        text, consumed, self.figs = decode(input, errors, self.figs)
+        return (text, consumed)
+
+    def reset(self):
+        codecs.StreamReader.reset(self)
+        self.figs = False
+
+
+def search(name):
+    '''Codec search function for use with codecs.register().'''
+
+    if name not in CODEC_NAMES:
+        return None
+    return codecs.CodecInfo(name=CODEC_NAMES[0],
+                            encode=tty_codec().encode,
+                            decode=tty_codec().decode,
+                            incrementalencoder=tty_encoder,
+                            incrementaldecoder=tty_decoder,
+                            streamwriter=tty_streamwriter,
+                            streamreader=tty_streamreader)
+
+
+codecs.register(search)
@@ -48,5 +48,5 @@ setup(name          = 'papertape',
       download_url  = __dl_url__,
       license       = 'GPLv3',
       packages      = ['papertape'],
-      scripts       = ['tapeutil.py', 'tapein.py', 'tapeout.py'])
+      scripts       = ['tapeutil.py', 'tapeclient.py', 'tapein.py', 'tapeout.py', 'tapesim.py'])
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Thin client for a tapeutil.py server started with --serve.
+
+Usage: tapeclient.py [--stdin] SOCKET [tapeutil.py arguments]
+
+The arguments are executed by the server as if given to tapeutil.py in
+the current directory, and its output and exit status are returned.
+With --stdin, data read from stdin is passed to the server as its stdin,
+e.g. for use with --stream - -.
+
+This script deliberately avoids importing papertape or argparse, so
+that it starts quickly.'''
+
+import os
+import sys
+import json
+import base64
+import socket
+import struct
+
+
+def send_message(sock, message):
+    '''Send message as a JSON document preceded by its length, framed
+    as by papertape.tapeutil.send_message().'''
+
+    data = json.dumps(message)
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def recv_exactly(sock, size):
+    '''Return size bytes read from sock, or None if the connection was
+    closed first.'''
+
+    data = []
+    while size > 0:
+        block = sock.recv(min(size, 65536))
+        if not block:
+            return None
+        data.append(block)
+        size = size - len(block)
+    return ''.join(data)
+
+
+def recv_message(sock):
+    '''Return next message received from sock, or None if the
+    connection was closed.'''
+
+    head = recv_exactly(sock, 4)
+    if head is None:
+        return None
+    data = recv_exactly(sock, struct.unpack('>I', head)[0])
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+# Main entry point when called as an executable script.
+if __name__ == '__main__':
+
+    argv  = sys.argv[1:]
+    stdin = ''
+    if argv and argv[0] == '--stdin':
+        stdin = sys.stdin.read()
+        argv  = argv[1:]
+    if not argv or argv[0] in ['-h', '--help']:
+        sys.stderr.write(__doc__.split('\n\n')[1] + '\n')
+        exit(1)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(argv[0])
+    except socket.error as e:
+        sys.stderr.write('ERROR: cannot connect to tapeutil.py server at {:s}: {:s}\n'.format(argv[0], str(e)))
+        exit(1)
+
+    # Arguments and paths are bytes, which need not be valid UTF-8, so
+    # are passed base64-encoded like stdin.
+    send_message(sock, {'argv':  [base64.b64encode(arg) for arg in argv[1:]],
+                        'cwd':   base64.b64encode(os.getcwd()),
+                        'stdin': base64.b64encode(stdin)})
+    response = recv_message(sock)
+    sock.close()
+    if response is None:
+        sys.stderr.write('ERROR: tapeutil.py server closed the connection.\n')
+        exit(1)
+
+    sys.stdout.write(base64.b64decode(response['stdout']))
+    sys.stderr.write(base64.b64decode(response['stderr']))
+    exit(response['status'])
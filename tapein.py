@@ -21,19 +21,80 @@
 
 '''Read in tape from reader/punch over serial interface.'''
 
+import os
 import sys
-import signal
+import time
 import serial
 import argparse
 import textwrap
 import papertape
+from papertape.progress import progress
+from papertape import serialio
 
+# Largest block read from the reader at once
+READ_BLOCK = 4096
 
-def ctrlc_handler(signum, frame):
-    '''Handler to be called when user presses ^C.'''
-    print ''
-    print 'Done!'
-    sys.exit(0)
+# Time in seconds to wait for the first char of each read, so that
+# ^C and periodic flushes are not held up by an idle reader
+READ_TIMEOUT = 0.1
+
+# Time in seconds between flushes of the output file to disk
+FLUSH_INTERVAL = 1.0
+
+
+def in_waiting(port):
+    '''Return number of chars waiting to be read from serial port.'''
+
+    try:
+        return port.in_waiting
+    except AttributeError:
+        # pySerial before 3.0
+        return port.inWaiting()
+
+
+def flush(outfile):
+    '''Flush output file through to disk.'''
+
+    outfile.flush()
+    os.fsync(outfile.fileno())
+
+
+def capture(reader, outfile, display):
+    '''Copy chars from reader to outfile until interrupted by ^C, or
+    until the reader is disconnected, reading as many chars at once as
+    the reader has waiting.'''
+
+    flushed = time.time()
+    try:
+        while True:
+            data = reader.read(max(1, min(in_waiting(reader), READ_BLOCK)))
+            if data:
+                outfile.write(data)
+                display.update(data)
+            if time.time() - flushed >= FLUSH_INTERVAL:
+                flush(outfile)
+                flushed = time.time()
+    except KeyboardInterrupt:
+        pass
+    except (serial.SerialException, IOError, OSError) as e:
+        sys.stderr.write('Reader disconnected: {:s}\n'.format(str(e)))
+
+
+def capture_ports(mux, out=sys.stdout):
+    '''Copy chars from the readers of multiplexer mux to their output
+    files until interrupted by ^C, showing the status of each reader
+    once per second while any are reading.'''
+
+    shown = [None]
+
+    def tick():
+        counts = [ep.stats.count for ep in mux.endpoints]
+        if counts != shown[0]:
+            shown[0] = counts
+            out.write(''.join([ep.status() + '\n' for ep in mux.endpoints]) + '\n')
+            out.flush()
+
+    mux.run(tick)
 
 
 # Main entry point when called as an executable script.
@@ -58,43 +119,91 @@ if __name__ == '__main__':
                         help='''Specify baud rate for tape reader input.
                         Defaults to 4800.''')
 
-    parser.add_argument('port', action='store', nargs=1,
+    parser.add_argument('--no_hex', action='store_true',
+                        help='''Show a running count of chars read, instead of a
+                        hex dump of them.''')
+
+    parser.add_argument('--ports', action='store', nargs='+',
+                        metavar='PORT=FILENAME',
+                        help='''Capture from several tape readers at once, each
+                        into its own file, instead of from PORT into FILENAME.
+                        The status of each reader is shown once per second.''')
+
+    parser.add_argument('port', action='store', nargs='?',
                         metavar='PORT',
                         help='Serial port for tape reader input.')
 
-    parser.add_argument('file', action='store', nargs=1,
+    parser.add_argument('file', action='store', nargs='?',
                         metavar='FILENAME',
                         help='Output file name.')
 
     # Parse the command-line arguments.
     args = parser.parse_args()
 
+    if args.ports:
+        if args.port is not None:
+            sys.stderr.write('ERROR: PORT and FILENAME may not be given with --ports.\n')
+            exit(1)
+        pairs = []
+        for pair in args.ports:
+            port, sep, filename = pair.partition('=')
+            if not (port and sep and filename):
+                sys.stderr.write('ERROR: expected PORT=FILENAME, not {:s}\n'.format(pair))
+                exit(1)
+            pairs.append((port, filename))
+
+        # Open all of the tape reader serial ports before creating any files.
+        ports = []
+        for port, filename in pairs:
+            try:
+                ports.append(serialio.open_port(port, args.baud[0]))
+            except (serial.SerialException, ValueError) as e:
+                sys.stderr.write('ERROR: cannot open port {:s}: {:s}\n'.format(port, str(e)))
+                exit(1)
+
+        mux = serialio.multiplexer()
+        for reader, (port, filename) in zip(ports, pairs):
+            mux.add(serialio.reader(reader, open(filename, 'wb', 65536), port))
+
+        print 'Start readers; press ^C to end capture.'
+
+        capture_ports(mux)
+
+        for ep in mux.endpoints:
+            ep.outfile.close()
+            print 'Done! {:s} read {:s}'.format(ep.name, ep.stats.summary())
+        exit(0)
+
+    if args.port is None or args.file is None:
+        sys.stderr.write('ERROR: PORT and FILENAME are required without --ports.\n')
+        exit(1)
+
 
     # Open the tape reader serial port.
     try:
-        reader = serial.Serial(port=args.port[0], baudrate=args.baud[0],
+        reader = serial.Serial(port=args.port, baudrate=args.baud[0],
                                bytesize=serial.EIGHTBITS,
-                               parity=serial.PARITY_NONE, timeout=None, xonxoff=False,
-                               rtscts=True, dsrdtr=False)
-    except:
-        print reader
-        sys.stderr.write('Error opening port.')
+                               parity=serial.PARITY_NONE, timeout=READ_TIMEOUT,
+                               xonxoff=False, rtscts=True, dsrdtr=False)
+    except (serial.SerialException, ValueError) as e:
+        sys.stderr.write('ERROR: cannot open port {:s}: {:s}\n'.format(args.port, str(e)))
+        exit(1)
 
-    outfile = open(args.file[0], 'wb')
+    outfile = open(args.file, 'wb', 65536)
 
 
     print 'Start reader; press ^C to end capture.'
 
-    signal.signal(signal.SIGINT, ctrlc_handler)
+    # The display is updated by its own thread, so that it never holds
+    # up reading.
+    display = progress(hexdump=not args.no_hex)
+    display.start()
+    capture(reader, outfile, display)
+    display.finish()
 
-    count = 0
+    flush(outfile)
+    outfile.close()
+    reader.close()
 
-    while True:
-        c = reader.read(1)
-        outfile.write(c)
-        outfile.flush()
-        sys.stdout.write('{:02X} '.format(ord(c)))
-        if (count % 16) == 15:
-            sys.stdout.write('\n')
-        count = count + 1
-        sys.stdout.flush()
+    print ''
+    print 'Done! Read {:s}'.format(display.summary())
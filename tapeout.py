@@ -22,11 +22,82 @@
 '''Send tape to reader/punch over serial interface.'''
 
 import sys
+import time
 import signal
 import serial
 import argparse
 import textwrap
 import papertape
+from papertape.progress import progress
+
+# Default largest block written to the punch at once
+WRITE_BLOCK = 256
+
+# Time in seconds of punching in each block, when pacing to a rated speed
+PACE_INTERVAL = 0.1
+
+
+def discard_output(punch):
+    '''Discard chars written to punch but not yet sent to it. Returns
+    number of chars discarded.'''
+
+    try:
+        queued = punch.out_waiting
+        punch.reset_output_buffer()
+    except AttributeError:
+        # pySerial before 3.0
+        queued = punch.outWaiting()
+        punch.flushOutput()
+    return queued
+
+
+def punch_tape(punch, data, display, cps=None, block=WRITE_BLOCK):
+    '''Write data to punch in blocks of up to block chars, waiting for
+    each block to drain before sending the next, so that hardware flow
+    control paces the writes. If cps is given, blocks are also scheduled
+    so as to keep the punch fed at cps chars per second without running
+    ahead of it. Returns number of chars punched, which is less than
+    len(data) if interrupted by ^C.'''
+
+    start    = time.time()
+    sent     = 0
+    writing  = [False]
+    deferred = []
+
+    def interrupt(signum, frame):
+        # A write interrupted part way through would leave the number
+        # of chars written unknown, so ^C is deferred until it returns.
+        if writing[0]:
+            deferred.append(signum)
+        else:
+            raise KeyboardInterrupt
+
+    handler = signal.signal(signal.SIGINT, interrupt)
+    try:
+        while sent < len(data):
+            if cps:
+                # Wait until this block is due at the rated speed
+                delay = start + (float(sent) / cps) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            chunk = data[sent:sent + block]
+            writing[0] = True
+            punch.write(chunk)
+            writing[0] = False
+            sent = sent + len(chunk)
+            display.update(chunk)
+            if deferred:
+                raise KeyboardInterrupt
+            punch.flush()
+    except KeyboardInterrupt:
+        # Chars still queued would be sent by closing the port, but not
+        # counted as punched, so discard them instead.
+        discarded = discard_output(punch)
+        sent      = sent - discarded
+        display.discard(discarded)
+    finally:
+        signal.signal(signal.SIGINT, handler)
+    return sent
 
 
 # Main entry point when called as an executable script.
@@ -51,6 +122,28 @@ if __name__ == '__main__':
                         help='''Specify baud rate for tape punch output.
                         Defaults to 4800.''')
 
+    parser.add_argument('--cps', action='store', nargs=1,
+                        metavar='CPS', default=[None], type=float,
+                        help='''Pace output to the rated speed of the punch, CPS chars
+                        per second. By default, output is paced only by the baud
+                        rate and flow control.''')
+
+    parser.add_argument('--block', action='store', nargs=1,
+                        metavar='BYTES', default=[None], type=int,
+                        help='''Write at most BYTES chars to the punch at once.
+                        Defaults to {:d}, or to {:g} seconds of punching when
+                        --cps is given.'''.format(WRITE_BLOCK, PACE_INTERVAL))
+
+    parser.add_argument('--start', action='store', nargs=1,
+                        metavar='OFFSET', default=[0], type=lambda x: int(x, 0),
+                        help='''Start punching at byte OFFSET of the file, e.g. to
+                        resume an interrupted run. May be given in hex with a 0x
+                        prefix. Defaults to 0.''')
+
+    parser.add_argument('--hex', action='store_true',
+                        help='''Show a hex dump of the chars punched, instead of a
+                        progress line.''')
+
     parser.add_argument('port', action='store', nargs=1,
                         metavar='PORT',
                         help='Serial port for tape punch output.')
@@ -66,23 +159,42 @@ if __name__ == '__main__':
     # Open the tape punch serial port.
     try:
         punch = serial.Serial(port=args.port[0], baudrate=args.baud[0],
-                               bytesize=serial.EIGHTBITS,
-                               parity=serial.PARITY_NONE, timeout=None, xonxoff=False,
-                               rtscts=True, dsrdtr=True)
-    except:
-        print punch
-        sys.stderr.write('Error opening port.')
+                              bytesize=serial.EIGHTBITS,
+                              parity=serial.PARITY_NONE, timeout=None, xonxoff=False,
+                              rtscts=True, dsrdtr=True)
+    except (serial.SerialException, ValueError) as e:
+        sys.stderr.write('ERROR: cannot open port {:s}: {:s}\n'.format(args.port[0], str(e)))
+        exit(1)
 
     infile = open(args.file[0], 'rb')
-
-    count = 0
-
-    for c in infile.read():
-        punch.write(c)
-        sys.stdout.write('{:02X} '.format(ord(c)))
-        if (count % 16) == 15:
-            sys.stdout.write('\n')
-        count = count + 1
-        sys.stdout.flush()
-
-    sys.stdout.write('\n')
+    data   = infile.read()
+    infile.close()
+
+    start = args.start[0]
+    if start < 0 or start > len(data):
+        sys.stderr.write('ERROR: --start must be from 0 to {:d}.\n'.format(len(data)))
+        exit(1)
+
+    cps   = args.cps[0]
+    block = args.block[0]
+    if block is None:
+        block = WRITE_BLOCK
+        if cps:
+            block = max(1, min(WRITE_BLOCK, int(cps * PACE_INTERVAL)))
+    if block < 1 or (cps is not None and cps <= 0):
+        sys.stderr.write('ERROR: --block and --cps must be positive.\n')
+        exit(1)
+
+    # The display is updated by its own thread, so that it never holds
+    # up punching.
+    display = progress(hexdump=args.hex, total=len(data), initial=start)
+    display.start()
+    sent = punch_tape(punch, data[start:], display, cps=cps, block=block)
+    display.finish()
+    punch.close()
+
+    if start + sent < len(data):
+        print 'Interrupted after punching {:s}'.format(display.summary())
+        print 'Resume with --start {:d}.'.format(start + sent)
+        exit(1)
+    print 'Done! Punched {:s}'.format(display.summary())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+#
+##########################################################################
+# Copyright (C) 2014 Mark J. Blair, NF6X
+#
+# This file is part of papertape.
+#
+#  papertape is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  papertape is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with papertape.  If not, see <http://www.gnu.org/licenses/>.
+##########################################################################
+
+'''Simulate a tape reader or punch on a pseudo-terminal, so that
+tapein.py and tapeout.py may be tested and benchmarked without hardware.
+
+The simulator prints the name of the pseudo-terminal to be given to
+tapein.py or tapeout.py as its port. As a reader, it feeds a tape image
+at the rated speed of the device; as a punch, it accepts data at that
+speed and saves it to a file. Either may stall periodically, as a
+device does when it runs out of tape or deasserts flow control. A
+stalled punch stops reading, so that the writer is held up by the full
+pseudo-terminal buffer, as by hardware flow control.'''
+
+import os
+import sys
+import tty
+import time
+import select
+import argparse
+import textwrap
+import papertape
+from papertape.progress import progress
+
+# Time in seconds of transfer in each block
+PACE_INTERVAL = 0.1
+
+# Largest block transferred at once
+IO_BLOCK = 4096
+
+# Default time in seconds after which a punch checking its data with
+# --expect stops if no more chars arrive
+EXPECT_IDLE = 5.0
+
+# Most chars skipped in data punched and in expected data to bring the
+# two back into step after a difference, and number of chars which
+# must then agree
+RESYNC_SKIP  = 64
+RESYNC_MATCH = 8
+
+
+def open_pty(link=None):
+    '''Open raw pseudo-terminal pair, optionally with a symbolic link
+    named link to its slave side. Returns (master, slave, name). The
+    slave side is held open, so that its settings persist between uses.'''
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    name = os.ttyname(slave)
+    if link:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(name, link)
+    return master, slave, name
+
+
+def pace(start, count, cps, stalled):
+    '''Sleep until count chars are due at cps chars per second after
+    start, allowing stalled seconds of stalls.'''
+
+    delay = start + stalled + (float(count) / cps) - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class stalls(object):
+    '''Schedule of flow control stalls, of seconds each after every
+    count chars.'''
+
+    def __init__(self, count=None, seconds=0.0):
+        self.count   = count
+        self.seconds = seconds
+        self.stalls  = 0
+        self.stalled = 0.0
+
+    def limit(self, done, block):
+        '''Return number of chars of block to transfer before the next stall.'''
+
+        if not self.count:
+            return block
+        return min(block, self.count - (done % self.count))
+
+    def check(self, done):
+        '''Stall if done chars have brought a stall due.'''
+
+        if self.count and done and (done % self.count) == 0:
+            time.sleep(self.seconds)
+            self.stalls  = self.stalls + 1
+            self.stalled = self.stalled + self.seconds
+
+
+def feed(master, data, display, cps, block, stall):
+    '''Feed data to master at cps chars per second, in blocks of up to
+    block chars. Returns number of chars fed, which is less than
+    len(data) if interrupted by ^C.'''
+
+    start = time.time()
+    done  = 0
+    try:
+        while done < len(data):
+            pace(start, done, cps, stall.stalled)
+            chunk = data[done:done + stall.limit(done, block)]
+            sent  = os.write(master, chunk)
+            done  = done + sent
+            display.update(chunk[:sent])
+            if done < len(data):
+                stall.check(done)
+    except KeyboardInterrupt:
+        pass
+    return done
+
+
+def accept(master, outfile, display, cps, block, stall, idle=None, count=None):
+    '''Copy chars from master to outfile at up to cps chars per second,
+    in blocks of up to block chars, until count chars have been read,
+    until no char has arrived for idle seconds after the first, or until
+    interrupted by ^C. Returns time in seconds from start to the first
+    char, or None if none arrived.'''
+
+    start = time.time()
+    first = None
+    last  = start
+    done  = 0
+    try:
+        while count is None or done < count:
+            if first is not None:
+                pace(first, done, cps, stall.stalled)
+            size = stall.limit(done, block)
+            if count is not None:
+                size = min(size, count - done)
+            if not select.select([master], [], [], PACE_INTERVAL)[0]:
+                if idle is not None and first is not None and time.time() - last >= idle:
+                    break
+                continue
+            data = os.read(master, size)
+            last = time.time()
+            if first is None:
+                first = last
+            outfile.write(data)
+            done = done + len(data)
+            display.update(data)
+            if count is None or done < count:
+                stall.check(done)
+    except KeyboardInterrupt:
+        pass
+    if first is None:
+        return None
+    return first - start
+
+
+def resync(data, expected, i, j):
+    '''Return (a, b), the fewest chars to skip in expected from i and in
+    data from j to bring the two back into step after a difference.'''
+
+    best = None
+    for a in xrange(RESYNC_SKIP + 1):
+        if best is not None and a >= sum(best):
+            break
+        key   = expected[i + a:i + a + RESYNC_MATCH]
+        found = data.find(key, j, j + RESYNC_SKIP + len(key))
+        if found >= 0 and (best is None or a + found - j < sum(best)):
+            best = (a, found - j)
+    if best is not None:
+        return best
+
+    # Look further ahead for a long run lost or added, or else count one
+    # char as corrupted.
+    skips = []
+    found = data.find(expected[i:i + RESYNC_MATCH], j)
+    if found >= 0:
+        skips.append((0, found - j))
+    found = expected.find(data[j:j + RESYNC_MATCH], i)
+    if found >= 0:
+        skips.append((found - i, 0))
+    if not skips:
+        return 1, 1
+    return min(skips, key=sum)
+
+
+def compare(data, expected):
+    '''Compare data with expected data, resynchronising the two after
+    each difference so that a lost char does not shift the rest. Returns
+    (dropped, corrupted, extra), the numbers of chars of expected missing
+    from data, of chars of expected replaced by others in data, and of
+    chars added in data.'''
+
+    dropped = corrupted = extra = 0
+    i = j = 0
+    while i < len(expected) and j < len(data):
+        if expected[i] == data[j]:
+            i = i + 1
+            j = j + 1
+            continue
+        a, b      = resync(data, expected, i, j)
+        corrupted = corrupted + min(a, b)
+        dropped   = dropped + max(0, a - b)
+        extra     = extra + max(0, b - a)
+        i = i + a
+        j = j + b
+    dropped = dropped + max(0, len(expected) - i)
+    extra   = extra + max(0, len(data) - j)
+    return dropped, corrupted, extra
+
+
+# Main entry point when called as an executable script.
+if __name__ == '__main__':
+
+    # Set up the command-line argument parser
+    parser = argparse.ArgumentParser(
+        prog='tapesim.py',
+        description=textwrap.dedent('''\
+        Simulated tape reader/punch utility version {:s}
+          {:s}
+          {:s}
+          {:s}\
+        '''.format(papertape.__version__, papertape.__copyright__,
+                       papertape.__pkg_url__, papertape.__dl_url__)),
+        add_help=True,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+
+    parser.add_argument('--baud', action='store', nargs=1,
+                        metavar='BAUD', default=[4800], type=int,
+                        help='''Specify simulated baud rate, limiting transfers
+                        to BAUD/10 chars per second. Defaults to 4800.''')
+
+    parser.add_argument('--cps', action='store', nargs=1,
+                        metavar='CPS', default=[None], type=float,
+                        help='''Specify rated speed of the simulated device, CPS
+                        chars per second, if slower than the baud rate.''')
+
+    parser.add_argument('--stall', action='store', nargs=2,
+                        metavar=('CHARS', 'SECONDS'), default=[None, 0.0], type=float,
+                        help='''Stall for SECONDS after every CHARS chars.''')
+
+    parser.add_argument('--link', action='store', nargs=1,
+                        metavar='PATH', default=[None],
+                        help='''Create symbolic link PATH to the pseudo-terminal,
+                        e.g. to give it a fixed name in test scripts. It is
+                        removed on exit.''')
+
+    parser.add_argument('--delay', action='store', nargs=1,
+                        metavar='SECONDS', default=[1.0], type=float,
+                        help='''As a reader, wait SECONDS before feeding, to give the
+                        program under test time to open the port. Defaults to 1.0.''')
+
+    parser.add_argument('--idle', action='store', nargs=1,
+                        metavar='SECONDS', default=[None], type=float,
+                        help='''As a punch, stop once no char has arrived for SECONDS
+                        after the first. As a reader, keep the port open for SECONDS
+                        after feeding. By default, run until interrupted by ^C, or
+                        as a punch with --expect, for {:g} seconds.'''.format(EXPECT_IDLE))
+
+    parser.add_argument('--count', action='store', nargs=1,
+                        metavar='CHARS', default=[None], type=int,
+                        help='''As a punch, stop after CHARS chars.''')
+
+    parser.add_argument('--expect', action='store', nargs=1,
+                        metavar='FILENAME', default=[None],
+                        help='''As a punch, count chars of FILENAME dropped from or
+                        corrupted in the data punched, and extra chars punched. Also
+                        stops after as many chars as are in FILENAME, unless --count
+                        is given, or after --idle seconds without a char, so that a
+                        run which loses chars still ends.''')
+
+    parser.add_argument('mode', action='store', nargs=1,
+                        choices=['reader', 'punch'],
+                        help='Device to simulate.')
+
+    parser.add_argument('file', action='store', nargs=1,
+                        metavar='FILENAME',
+                        help='''Tape image to feed as a reader, or file to save
+                        punched data in as a punch.''')
+
+    # Parse the command-line arguments.
+    args = parser.parse_args()
+
+
+    cps = args.baud[0] / 10.0
+    if args.cps[0] is not None:
+        cps = min(cps, args.cps[0])
+    if cps <= 0:
+        sys.stderr.write('ERROR: --baud and --cps must be positive.\n')
+        exit(1)
+    block = max(1, min(IO_BLOCK, int(cps * PACE_INTERVAL)))
+
+    chars, seconds = args.stall
+    if chars is not None and (chars < 1 or seconds < 0):
+        sys.stderr.write('ERROR: --stall needs positive CHARS and SECONDS.\n')
+        exit(1)
+    stall = stalls(chars and int(chars), seconds)
+
+    if args.mode[0] == 'reader':
+        try:
+            infile = open(args.file[0], 'rb')
+        except IOError as e:
+            sys.stderr.write('ERROR: cannot open {:s}: {:s}\n'.format(args.file[0], str(e)))
+            exit(1)
+        data = infile.read()
+        infile.close()
+
+    master, slave, name = open_pty(args.link[0])
+    print 'Simulating tape {:s} on {:s} at {:.0f} chars/sec.'.format(args.mode[0], name, cps)
+    sys.stdout.flush()
+
+    display = progress(hexdump=False)
+    try:
+        if args.mode[0] == 'reader':
+            time.sleep(args.delay[0])
+            display.total = len(data)
+            display.start()
+            feed(master, data, display, cps, block, stall)
+            display.finish()
+            if args.idle[0] is not None:
+                time.sleep(args.idle[0])
+            print 'Fed {:s}'.format(display.summary())
+        else:
+            expected = None
+            count    = args.count[0]
+            idle     = args.idle[0]
+            if args.expect[0] is not None:
+                expected = open(args.expect[0], 'rb').read()
+                if count is None:
+                    count = len(expected)
+                if idle is None:
+                    idle = EXPECT_IDLE
+            outfile = open(args.file[0], 'wb')
+            display.total = count
+            display.start()
+            latency = accept(master, outfile, display, cps, block, stall,
+                             idle, count)
+            display.finish()
+            outfile.close()
+            print 'Punched {:s}'.format(display.summary())
+            if latency is not None:
+                print 'First char arrived after {:.3f} seconds.'.format(latency)
+            if expected is not None:
+                lost, corrupted, extra = compare(open(args.file[0], 'rb').read(), expected)
+                print '{:d} chars dropped, {:d} corrupted, {:d} extra.'.format(lost, corrupted, extra)
+        if stall.stalls:
+            print 'Stalled {:d} times for {:.1f} seconds in all.'.format(stall.stalls, stall.stalled)
+    finally:
+        os.close(master)
+        os.close(slave)
+        if args.link[0] and os.path.islink(args.link[0]):
+            os.remove(args.link[0])
+
+    if args.mode[0] == 'punch' and expected is not None and (lost or corrupted or extra):
+        exit(1)